@@ -0,0 +1,202 @@
+"""
+API JSON (ASGI) dos contratos, ao lado da interface Streamlit
+
+O trabalho bloqueante corre fora do event loop, com filas limitadas: o SQLite
+através de AsyncDatabase (leitores em paralelo, um único escritor) e os PDFs
+num pool de threads mais pequeno. Com uma fila cheia o pedido é recusado com
+503 (Retry-After) em vez de se acumular sem limite.
+
+Criar contratos é público (adesão). As restantes rotas são administrativas e
+exigem "Authorization: Bearer <CONTRATOS_API_TOKEN>"; sem token configurado
+ficam desativadas.
+
+    POST /contracts                      cria um contrato (dados do cliente + plano)
+    GET  /contracts?search=&cursor=&limit=   lista/busca paginada (cursor)
+    GET  /contracts/{numero}             dados do contrato
+    GET  /contracts/{numero}/pdf         PDF do contrato
+    GET  /settings                       dados da contratada
+    PUT  /settings                       altera dados da contratada
+
+Uso: CONTRATOS_API_TOKEN=... uvicorn api:app --port 8000 [--workers 2]
+     (CONTRATOS_DB escolhe o banco; padrão contratos.db. Com CONTRATOS_GROUP_COMMIT=1
+     os novos contratos são gravados em lotes - ver group_commit.py)
+"""
+import base64
+import hmac
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from async_database import READER_THREADS, AsyncDatabase, BoundedExecutor, Overloaded
+from database import Database
+from group_commit import GroupCommitWriter
+from importer import validate_row
+from pdf_cache import PDFCache
+
+PDF_WORKERS = 2          # Gerar PDFs é CPU (Python puro): mais threads não ajudam
+MAX_PENDING_DB = 256
+MAX_PENDING_PDF = 32
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SETTINGS_KEYS = ('contratada_nome', 'contratada_nif', 'contratada_endereco')
+
+
+def encode_cursor(cursor: Optional[Tuple[str, int]]) -> Optional[str]:
+    """(created_at, id) -> texto opaco para o parâmetro cursor"""
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverso de encode_cursor; levanta ValueError se o cursor for inválido"""
+    try:
+        created_at, contract_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(created_at), int(contract_id)
+    except Exception:
+        raise ValueError(f"cursor inválido: {cursor}")
+
+
+def _require_admin(request: Request):
+    token = request.app.state.api_token
+    if not token:
+        raise HTTPException(403, "API administrativa desativada (defina CONTRATOS_API_TOKEN)")
+    authorization = request.headers.get('authorization', '')
+    if not hmac.compare_digest(authorization.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+        raise HTTPException(401, "Token inválido")
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "JSON inválido")
+    if not isinstance(body, dict):
+        raise HTTPException(400, "O corpo tem de ser um objeto JSON")
+    return body
+
+
+async def create_contract(request: Request) -> JSONResponse:
+    body = await _json_body(request)
+    db = request.app.state.db
+    # A data é sempre a do servidor (created_at só existe na importação)
+    row = {key: value for key, value in body.items() if key != 'created_at'}
+    try:
+        contract = validate_row(row, await db.get_plan_catalog(), a_venda=True)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    contract_number = await db.create_contract(**contract)
+    return JSONResponse({'contract_number': contract_number}, status_code=201)
+
+
+async def list_contracts(request: Request) -> JSONResponse:
+    _require_admin(request)
+    params = request.query_params
+    try:
+        page_size = min(int(params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        cursor = decode_cursor(params['cursor']) if params.get('cursor') else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if page_size < 1:
+        raise HTTPException(400, "limit tem de ser positivo")
+
+    page = await request.app.state.db.get_contracts_page(page_size, cursor, params.get('search') or None)
+    page['next_cursor'] = encode_cursor(page['next_cursor'])
+    return JSONResponse(page)
+
+
+async def get_contract(request: Request) -> JSONResponse:
+    _require_admin(request)
+    contract = await request.app.state.db.get_contract_by_number(request.path_params['number'])
+    if contract is None:
+        raise HTTPException(404, "Contrato não encontrado")
+    return JSONResponse(contract)
+
+
+async def get_contract_pdf(request: Request) -> Response:
+    _require_admin(request)
+    contract_number = request.path_params['number']
+    pdf_bytes = await request.app.state.pdf_executor.run(request.app.state.pdf_cache.get_contract_pdf, contract_number)
+    if pdf_bytes is None:
+        raise HTTPException(404, "Contrato não encontrado")
+    if not pdf_bytes:
+        raise HTTPException(500, "Erro ao gerar o PDF")
+    return Response(
+        pdf_bytes, media_type='application/pdf',
+        headers={'Content-Disposition': f'attachment; filename="{contract_number}.pdf"'}
+    )
+
+
+async def get_settings(request: Request) -> JSONResponse:
+    _require_admin(request)
+    return JSONResponse(await request.app.state.db.get_settings())
+
+
+async def put_settings(request: Request) -> JSONResponse:
+    _require_admin(request)
+    body = await _json_body(request)
+    unknown = sorted(set(body) - set(SETTINGS_KEYS))
+    if unknown:
+        raise HTTPException(400, f"Configurações desconhecidas: {', '.join(unknown)}")
+    if not all(isinstance(value, str) for value in body.values()):
+        raise HTTPException(400, "Os valores das configurações têm de ser texto")
+
+    db = request.app.state.db
+    await db.set_settings(body)
+    return JSONResponse(await db.get_settings())
+
+
+async def _http_error(request: Request, exc: HTTPException) -> JSONResponse:
+    return JSONResponse({'erro': exc.detail}, status_code=exc.status_code)
+
+
+async def _overloaded(request: Request, exc: Overloaded) -> JSONResponse:
+    return JSONResponse({'erro': "Servidor ocupado, tente novamente"}, status_code=503, headers={'Retry-After': '1'})
+
+
+def create_app(db_name: str = "contratos.db", api_token: Optional[str] = None, group_commit: bool = False) -> Starlette:
+    """Aplicação ASGI; o banco e os executores são criados no arranque do servidor"""
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        # Uma conexão do pool por leitor e por thread de PDFs (os escritores têm conexão própria)
+        db = Database(db_name, pool_size=READER_THREADS + PDF_WORKERS)
+        app.state.db = AsyncDatabase(
+            db, max_pending=MAX_PENDING_DB, group_commit=GroupCommitWriter(db) if group_commit else None
+        )
+        app.state.pdf_cache = PDFCache(app.state.db.db)
+        app.state.pdf_executor = BoundedExecutor(PDF_WORKERS, MAX_PENDING_PDF, 'api-pdf')
+        try:
+            yield
+        finally:
+            app.state.pdf_executor.shutdown()
+            app.state.db.close()
+
+    app = Starlette(
+        routes=[
+            Route('/contracts', create_contract, methods=['POST']),
+            Route('/contracts', list_contracts, methods=['GET']),
+            Route('/contracts/{number}', get_contract, methods=['GET']),
+            Route('/contracts/{number}/pdf', get_contract_pdf, methods=['GET']),
+            Route('/settings', get_settings, methods=['GET']),
+            Route('/settings', put_settings, methods=['PUT']),
+        ],
+        exception_handlers={HTTPException: _http_error, Overloaded: _overloaded},
+        lifespan=lifespan,
+    )
+    app.state.api_token = api_token
+    return app
+
+
+app = create_app(
+    os.environ.get('CONTRATOS_DB', 'contratos.db'),
+    os.environ.get('CONTRATOS_API_TOKEN'),
+    os.environ.get('CONTRATOS_GROUP_COMMIT') == '1'
+)
@@ -5,16 +5,23 @@ Micaela Sampaio - Estética Avançada
 Interface Premium para Gestão de Contratos
 """
 
+import os
 import streamlit as st
-from streamlit_drawable_canvas import st_canvas
-import pandas as pd
-from datetime import datetime
-import base64
-from io import BytesIO
+from datetime import date, datetime
+import html
+import tempfile
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
+from batch_pdf import month_range, render_contracts_zip
 from database import Database
-from pdf_generator import generate_contract_pdf
-from contract_text import PLANOS, get_contrato_completo
+from exporter import EXPORT_FORMATS, export_contracts
+from async_database import Overloaded
+from group_commit import GroupCommitWriter
+from pdf_cache import PDFCache
+from render_queue import RenderQueue
+from contract_text import (
+    BLOCO_CLAUSULA, BLOCO_PARTES, BLOCO_SEPARADOR, BLOCO_SUBTITULO, PERIODO_TEXTO, Plano, get_contrato_blocos
+)
 
 # Configuração da página
 st.set_page_config(
@@ -359,8 +366,62 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Inicializar banco de dados
-db = Database()
+@st.cache_resource
+def get_database() -> Database:
+    """Banco de dados (pool de conexões e migrações) criado uma vez por processo, não a cada rerun"""
+    return Database()
+
+@st.cache_resource
+def get_pdf_cache() -> PDFCache:
+    """Cache de PDFs partilhado por todas as sessões (mantém os contadores entre reruns)"""
+    return PDFCache(get_database())
+
+# Consultas de contratos em cache entre reruns e sessões, invalidadas por
+# create_contract; o ttl cobre contratos gravados fora da aplicação (ex.:
+# importer.py, API). As configurações não entram aqui: Database.get_settings()
+# já as guarda em memória e vê alterações de outros processos pela versão
+CONTRACTS_CACHE_TTL = 60
+
+@st.cache_data(ttl=CONTRACTS_CACHE_TTL, max_entries=256, show_spinner=False)
+def load_contracts_page(search: str, cursor, page_size: int) -> dict:
+    """Página da listagem/busca de contratos (Database.get_contracts_page)"""
+    return get_database().get_contracts_page(page_size=page_size, cursor=cursor, search=search or None)
+
+@st.cache_data(ttl=CONTRACTS_CACHE_TTL, max_entries=32, show_spinner=False)
+def load_contract_numbers_between(start: str, end: str) -> list:
+    """Números dos contratos criados entre start e end"""
+    return get_database().get_contract_numbers_between(start, end)
+
+def invalidate_contracts():
+    """Esvazia as consultas de contratos em cache (depois de criar contratos)"""
+    load_contracts_page.clear()
+    load_contract_numbers_between.clear()
+
+db = get_database()
+
+@st.cache_resource
+def get_contract_writer():
+    """
+    Quem grava os novos contratos: o próprio Database ou, com CONTRATOS_GROUP_COMMIT=1,
+    um GroupCommitWriter partilhado pelas sessões (adesões em simultâneo gravadas em lotes)
+    """
+    if os.environ.get('CONTRATOS_GROUP_COMMIT') == '1':
+        return GroupCommitWriter(get_database())
+    return get_database()
+
+@st.cache_resource
+def get_render_queue() -> RenderQueue:
+    """Fila de geração de PDFs em segundo plano, partilhada por todas as sessões"""
+    return RenderQueue(get_pdf_cache())
+
+pdf_cache = get_pdf_cache()
+render_queue = get_render_queue()
+
+# Segundos que a página de sucesso espera pelo PDF antes de pedir para atualizar
+PDF_WAIT_SECONDS = 20
+
+# Contratos por página na área administrativa
+ADMIN_PAGE_SIZE = 50
 
 # Inicializar session state
 if 'view' not in st.session_state:
@@ -371,6 +432,10 @@ if 'form_data' not in st.session_state:
     st.session_state.form_data = {}
 if 'contract_number' not in st.session_state:
     st.session_state.contract_number = None
+if 'admin_cursors' not in st.session_state:
+    st.session_state.admin_cursors = [None]  # Cursor de início de cada página visitada
+if 'admin_search' not in st.session_state:
+    st.session_state.admin_search = ""
 
 # Funções auxiliares
 def reset_client_flow():
@@ -379,11 +444,11 @@ def reset_client_flow():
     st.session_state.form_data = {}
     st.session_state.contract_number = None
 
-def get_plan_card(plan_name: str, info: dict) -> str:
+def get_plan_card(plano: Plano) -> str:
     """Gera o HTML do card de plano"""
     economia_text = ""
-    if info.get('economia_anual', 0) > 0:
-        economia_text = f" - Economize {info['economia_anual']}€/ano"
+    if plano.economia_anual > 0:
+        economia_text = f" - Economize {plano.economia_anual}€/ano"
     
     return f"""
     <div style="
@@ -394,16 +459,118 @@ def get_plan_card(plan_name: str, info: dict) -> str:
         box-shadow: 0 4px 6px rgba(0,0,0,0.08);
         transition: all 0.3s ease;
     ">
-        <h3 style="color: #D4AF37; margin-top: 0;">{info['nome_display']}</h3>
+        <h3 style="color: #D4AF37; margin-top: 0;">{html.escape(plano.nome_display)}</h3>
         <p style="font-size: 1.8rem; font-weight: 600; color: #333333; margin: 0.5rem 0;">
-            {info['valor_mensal']}€/mês
+            {plano.valor_mensal}€/mês
         </p>
         <p style="color: #666666; margin: 0;">
-            {info['descricao']}{economia_text}
+            {html.escape(plano.descricao)}{economia_text}
         </p>
     </div>
     """
 
+def get_contrato_html(dados: dict, plano: Plano) -> str:
+    """Gera o HTML da pré-visualização do contrato a partir do modelo compilado"""
+    linhas = []
+    for bloco in get_contrato_blocos(dados, plano):
+        if bloco.tipo == BLOCO_SEPARADOR:
+            continue
+        if bloco.tipo == BLOCO_PARTES:
+            linhas.extend(html.escape(filho.texto) for filho in bloco.filhos)
+        elif bloco.tipo in (BLOCO_CLAUSULA, BLOCO_SUBTITULO):
+            linhas.append(f"<strong>{html.escape(bloco.texto)}</strong>")
+        else:
+            linhas.append(html.escape(bloco.texto))
+    return "<br>".join(linhas)
+
+def get_preview_html(form_data: dict, settings_version: int, plans_version: int) -> str:
+    """
+    HTML da pré-visualização do contrato, memorizado na sessão
+    Só é gerado de novo quando mudam os dados do formulário, a versão das
+    configurações, a versão dos planos ou o dia (a data por extenso no contrato)
+    """
+    key = (tuple(sorted(form_data.items())), settings_version, plans_version, date.today())
+    cached = st.session_state.get('preview_html')
+    if cached and cached[0] == key:
+        return cached[1]
+    
+    # Número de contrato temporário e dados da contratada do banco
+    # (Database.get_settings confere a versão: nunca mais antigos do que settings_version)
+    dados = dict(form_data)
+    dados['numero_contrato'] = 'CTR-2024-PREVIEW'
+    dados.update(get_database().get_settings())
+    
+    # Versão atual do plano, a mesma que fica gravada no contrato
+    plano = get_database().get_plan_catalog().resolver(dados.get('plano', ''))
+    preview_html = get_contrato_html(dados, plano)
+    st.session_state.preview_html = (key, preview_html)
+    return preview_html
+
+@st.fragment
+def signature_pad():
+    """Canvas de assinatura e botões da etapa 3 (desenhar não re-executa a página inteira)"""
+    from streamlit_drawable_canvas import st_canvas
+    
+    # Canvas de assinatura
+    canvas_result = st_canvas(
+        fill_color="rgba(255, 255, 255, 0)",
+        stroke_width=3,
+        stroke_color="#333333",
+        background_color="#FFFFFF",
+        height=200,
+        width=600,
+        drawing_mode="freedraw",
+        key="signature_canvas",
+    )
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("⬅️ VOLTAR"):
+            st.session_state.step = 'plan'
+            st.rerun()
+    
+    with col2:
+        if st.button("FINALIZAR ADESÃO", type="primary"):
+            # Validar assinatura
+            if canvas_result.image_data is None:
+                st.error("Por favor, assine o contrato antes de finalizar.")
+            else:
+                # Converter assinatura para PNG (gravado como BLOB)
+                from PIL import Image
+                import io
+                
+                img = Image.fromarray(canvas_result.image_data.astype('uint8'), 'RGBA')
+                buffered = io.BytesIO()
+                img.save(buffered, format="PNG")
+                signature_data = buffered.getvalue()
+                
+                # Salvar no banco de dados
+                try:
+                    contract_number = get_contract_writer().create_contract(
+                        nome=st.session_state.form_data['nome'],
+                        nif=st.session_state.form_data['nif'],
+                        whatsapp=st.session_state.form_data['whatsapp'],
+                        email=st.session_state.form_data['email'],
+                        endereco=st.session_state.form_data['endereco'],
+                        plano=st.session_state.form_data['plano'],
+                        signature_data=signature_data
+                    )
+                except (FuturesTimeoutError, Overloaded, RuntimeError) as e:
+                    # Só no modo group commit: fila cheia, espera excedida ou escritor parado
+                    print(f"Erro ao gravar contrato: {e!r}")
+                    st.error("Não foi possível gravar o contrato agora. Por favor, tente novamente dentro de instantes.")
+                    return
+                invalidate_contracts()
+                # Começar a gerar o PDF já; com a fila cheia é gerado na página de sucesso
+                render_queue.submit(contract_number)
+                
+                st.session_state.contract_number = contract_number
+                st.session_state.step = 'success'
+                st.rerun()
+
 # ============================================
 # VISUALIZAÇÃO PRINCIPAL
 # ============================================
@@ -412,6 +579,9 @@ if st.session_state.view == 'admin':
     # ============================================
     # AREA ADMINISTRATIVA
     # ============================================
+    # pandas só é carregado na área administrativa (o fluxo do cliente não o usa)
+    import pandas as pd
+    
     col_logo, col_logout = st.columns([6, 1])
     with col_logo:
         st.title("Painel Admin 🔐")
@@ -422,23 +592,28 @@ if st.session_state.view == 'admin':
             st.rerun()
             
     # Navegação por Abas (Melhor que sidebar neste caso)
-    tab_contratos, tab_config = st.tabs(["📋 Contratos Gerados", "⚙️ Configurações da Empresa"])
+    tab_contratos, tab_planos, tab_config = st.tabs(
+        ["📋 Contratos Gerados", "💶 Planos", "⚙️ Configurações da Empresa"]
+    )
 
     with tab_contratos:
         st.markdown("### 🔍 Pesquisar Contratos")
         
         # Filtro de busca
-        search = st.text_input("Buscar por nome do cliente", label_visibility="collapsed", placeholder="Digite o nome do cliente...")
+        search = st.text_input("Buscar contratos", label_visibility="collapsed", placeholder="Digite nome, NIF, email, WhatsApp ou endereço...")
         
-        if search:
-            contracts = db.search_contracts(search)
-        else:
-            contracts = db.get_all_contracts()
+        # Voltar à primeira página quando a busca muda
+        if st.session_state.admin_search != search:
+            st.session_state.admin_search = search
+            st.session_state.admin_cursors = [None]
+        
+        page = load_contracts_page(search, st.session_state.admin_cursors[-1], ADMIN_PAGE_SIZE)
+        contracts = page['items']
             
         if not contracts:
             st.info("Nenhum contrato encontrado.")
         else:
-            # Exibir tabela simplificada
+            # Exibir tabela simplificada (apenas a página atual)
             df_display = pd.DataFrame(contracts)
             st.dataframe(
                 df_display[['contract_number', 'nome', 'plano', 'created_at']],
@@ -452,26 +627,29 @@ if st.session_state.view == 'admin':
                 use_container_width=True
             )
             
+            # Navegação entre páginas
+            page_number = len(st.session_state.admin_cursors)
+            col_prev, col_info, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                if page_number > 1 and st.button("⬅️ Anterior", key="btn_page_prev"):
+                    st.session_state.admin_cursors.pop()
+                    st.rerun()
+            with col_info:
+                st.caption(f"Página {page_number} · cerca de {page['total_estimate']} contratos")
+            with col_next:
+                if page['next_cursor'] and st.button("Próxima ➡️", key="btn_page_next"):
+                    st.session_state.admin_cursors.append(page['next_cursor'])
+                    st.rerun()
+            
             st.markdown("---")
             st.markdown("### 📥 Baixar Contrato")
             contract_numbers = [c['contract_number'] for c in contracts]
             selected_contract = st.selectbox("Selecione o contrato", contract_numbers)
             
             if st.button("Gerar PDF"):
-                contract_data = db.get_contract_by_number(selected_contract)
-                if contract_data:
-                    contract_data['numero_contrato'] = contract_data['contract_number']
-                    
-                    # Injetar dados da contratada do banco
-                    contratada_info = {
-                        'contratada_nome': db.get_setting('contratada_nome'),
-                        'contratada_nif': db.get_setting('contratada_nif'),
-                        'contratada_endereco': db.get_setting('contratada_endereco')
-                    }
-                    contract_data.update(contratada_info)
-                    
-                    pdf_bytes = generate_contract_pdf(contract_data)
-                    
+                # PDF reutilizado do cache enquanto contrato, configurações e template não mudarem
+                pdf_bytes = pdf_cache.get_contract_pdf(selected_contract)
+                if pdf_bytes is not None:
                     st.download_button(
                         label="⬇️ Baixar PDF",
                         data=pdf_bytes,
@@ -479,20 +657,141 @@ if st.session_state.view == 'admin':
                         mime="application/pdf",
                         type="primary"
                     )
+            
+            cache_stats = pdf_cache.stats()
+            st.caption(f"Cache de PDFs: {cache_stats['hits']} hits · {cache_stats['misses']} misses")
+    
+        st.markdown("---")
+        st.markdown("### 🗂️ PDFs do Mês (ZIP)")
+        batch_month = st.text_input("Mês (AAAA-MM)", value=datetime.now().strftime('%Y-%m'), key="batch_month")
+        
+        if st.button("Gerar ZIP do Mês"):
+            try:
+                month_numbers = load_contract_numbers_between(*month_range(batch_month))
+            except ValueError:
+                st.error("❌ Mês inválido. Use o formato AAAA-MM.")
+                month_numbers = None
+            
+            if month_numbers == []:
+                st.info("Nenhum contrato neste mês.")
+            elif month_numbers:
+                progress_bar = st.progress(0.0, text=f"0/{len(month_numbers)} PDFs")
+                
+                def update_progress(done, total):
+                    progress_bar.progress(done / total, text=f"{done}/{total} PDFs")
+                
+                zip_file = tempfile.TemporaryFile(buffering=0)
+                written = render_contracts_zip(db.db_name, month_numbers, zip_file, progress=update_progress)
+                zip_file.seek(0)
+                st.download_button(
+                    label=f"⬇️ Baixar ZIP ({written} contratos)",
+                    data=zip_file,
+                    file_name=f"contratos-{batch_month}.zip",
+                    mime="application/zip",
+                    type="primary"
+                )
+        
+        st.markdown("---")
+        st.markdown("### 📤 Exportar Contratos")
+        col_format, col_signatures = st.columns(2)
+        with col_format:
+            export_format = st.selectbox("Formato", list(EXPORT_FORMATS), key="export_format")
+        with col_signatures:
+            export_signatures = st.checkbox("Incluir assinaturas", key="export_signatures")
+        
+        if st.button("Preparar Exportação"):
+            # Escrita em ficheiro temporário, lote a lote (memória constante)
+            export_file = tempfile.TemporaryFile(buffering=0)
+            try:
+                count = export_contracts(db, export_file, export_format, export_signatures)
+            except ImportError as e:
+                st.error(f"❌ {e}")
+            else:
+                export_file.seek(0)
+                st.download_button(
+                    label=f"⬇️ Baixar {count} contratos",
+                    data=export_file,
+                    file_name=f"contratos.{export_format}",
+                    mime=EXPORT_FORMATS[export_format],
+                    type="primary"
+                )
+    
+    with tab_planos:
+        st.markdown("### 💶 Planos")
+        st.markdown(
+            "Cada alteração grava uma nova versão do plano. Os contratos já assinados "
+            "continuam com a versão em que foram assinados."
+        )
+        
+        # Todos os planos da tabela, incluindo os retirados de venda (para os poder reativar)
+        catalogo = db.get_plan_catalog()
+        st.dataframe(
+            pd.DataFrame(
+                [plano._asdict() for plano in catalogo.todos.values()],
+                columns=['nome', 'version', 'nome_display', 'valor_mensal', 'sessoes', 'fidelidade', 'economia_anual', 'ativo']
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        plano_nome = st.selectbox(
+            "Plano", list(catalogo.todos),
+            format_func=lambda nome: nome if catalogo.todos[nome].ativo else f"{nome} (fora de venda)"
+        )
+        plano = catalogo.todos.get(plano_nome)
+        periodos = list(PERIODO_TEXTO)
+        
+        if plano is None:
+            st.info("Não há planos na tabela de planos.")
+        else:
+            with st.form("plan_form"):
+                p_display = st.text_input("Nome de exibição", value=plano.nome_display)
+                p_descricao = st.text_input("Descrição", value=plano.descricao)
+                col_p1, col_p2, col_p3 = st.columns(3)
+                with col_p1:
+                    p_valor = st.number_input("Valor mensal (€)", min_value=0, value=plano.valor_mensal)
+                    p_sessoes = st.number_input("Sessões/mês", min_value=1, value=plano.sessoes)
+                with col_p2:
+                    p_periodo = st.selectbox("Período", periodos, index=periodos.index(plano.periodo))
+                    p_fidelidade = st.number_input("Fidelidade (meses)", min_value=1, value=plano.fidelidade)
+                with col_p3:
+                    p_economia = st.number_input("Economia anual (€)", min_value=0, value=plano.economia_anual)
+                    p_reagendamentos = st.number_input("Reagendamentos/mês", min_value=0, value=plano.reagendamentos)
+                p_desconto = st.text_input("Desconto em serviços extras", value=plano.desconto_extras)
+                p_ativo = st.checkbox("À venda", value=plano.ativo)
+            
+                if st.form_submit_button("Gravar Nova Versão", type="primary"):
+                    version = db.save_plan(plano_nome, {
+                        'nome_display': p_display,
+                        'descricao': p_descricao,
+                        'valor_mensal': int(p_valor),
+                        'sessoes': int(p_sessoes),
+                        'periodo': p_periodo,
+                        'fidelidade': int(p_fidelidade),
+                        'economia_anual': int(p_economia),
+                        'reagendamentos': int(p_reagendamentos),
+                        'desconto_extras': p_desconto,
+                        'ativo': p_ativo
+                    })
+                    st.success(f"✅ {plano_nome} gravado na versão {version}!")
+                    st.rerun()
     
     with tab_config:
         st.markdown("### ⚙️ Dados da Contratada")
         st.markdown("Estes dados aparecerão no cabeçalho e corpo de todos os novos contratos.")
         
         with st.form("settings_form"):
-            c_nome = st.text_input("Nome da Contratada/Empresa", value=db.get_setting('contratada_nome'))
-            c_nif = st.text_input("NIF", value=db.get_setting('contratada_nif'))
-            c_endereco = st.text_input("Endereço Completo", value=db.get_setting('contratada_endereco'))
+            settings = db.get_settings()
+            c_nome = st.text_input("Nome da Contratada/Empresa", value=settings.get('contratada_nome', ''))
+            c_nif = st.text_input("NIF", value=settings.get('contratada_nif', ''))
+            c_endereco = st.text_input("Endereço Completo", value=settings.get('contratada_endereco', ''))
             
             if st.form_submit_button("Salvar Alterações", type="primary"):
-                db.set_setting('contratada_nome', c_nome)
-                db.set_setting('contratada_nif', c_nif)
-                db.set_setting('contratada_endereco', c_endereco)
+                db.set_settings({
+                    'contratada_nome': c_nome,
+                    'contratada_nif': c_nif,
+                    'contratada_endereco': c_endereco
+                })
                 st.success("✅ Dados atualizados com sucesso!")
                 st.rerun()
 
@@ -561,14 +860,17 @@ else:
         # Grid de Planos Clicáveis
         col1, col2 = st.columns(2)
         cols = [col1, col2]
+        planos_a_venda = db.get_plan_catalog().planos
+        if not planos_a_venda:
+            st.warning("De momento não há planos disponíveis para adesão. Por favor, contacte-nos.")
         
-        # Iterar sobre os planos e criar botões
-        for i, (key, info) in enumerate(PLANOS.items()):
+        # Iterar sobre os planos à venda e criar botões
+        for i, (key, plano) in enumerate(planos_a_venda.items()):
             with cols[i % 2]:
                 # Criar label formatada
-                label = f"{info['nome_display']}\n{info['valor_mensal']}€/mês"
-                if info.get('economia_anual'):
-                    label += f"\n(Economia: {info['economia_anual']}€)"
+                label = f"{plano.nome_display}\n{plano.valor_mensal}€/mês"
+                if plano.economia_anual:
+                    label += f"\n(Economia: {plano.economia_anual}€)"
                 
                 # Botão Card (Secondary) que seleciona e avança
                 if st.button(label, key=f"btn_{key}", use_container_width=True, type="secondary"):
@@ -590,76 +892,15 @@ else:
         
         st.markdown("### Revise e assine seu contrato")
         
-        # Gerar número de contrato temporário para visualização
-        temp_contract_data = st.session_state.form_data.copy()
-        temp_contract_data['numero_contrato'] = 'CTR-2024-PREVIEW'
-        
-        # Injetar dados da contratada do banco para o preview
-        contratada_info = {
-            'contratada_nome': db.get_setting('contratada_nome'),
-            'contratada_nif': db.get_setting('contratada_nif'),
-            'contratada_endereco': db.get_setting('contratada_endereco')
-        }
-        temp_contract_data.update(contratada_info)
-        
-        # Mostrar contrato
-        contrato_texto = get_contrato_completo(temp_contract_data)
-        st.markdown(f'<div class="contrato-box">{contrato_texto.replace(chr(10), "<br>")}</div>', unsafe_allow_html=True)
+        # Pré-visualização memorizada: os reruns da etapa não voltam a gerar o texto
+        preview_html = get_preview_html(st.session_state.form_data, db.get_settings_version(), db.get_plans_version())
+        st.markdown(f'<div class="contrato-box">{preview_html}</div>', unsafe_allow_html=True)
         
         st.markdown("<br>", unsafe_allow_html=True)
         st.markdown("### ✍️ Assine aqui")
         
-        # Canvas de assinatura
-        canvas_result = st_canvas(
-            fill_color="rgba(255, 255, 255, 0)",
-            stroke_width=3,
-            stroke_color="#333333",
-            background_color="#FFFFFF",
-            height=200,
-            width=600,
-            drawing_mode="freedraw",
-            key="signature_canvas",
-        )
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if st.button("⬅️ VOLTAR"):
-                st.session_state.step = 'plan'
-                st.rerun()
-        
-        with col2:
-            if st.button("FINALIZAR ADESÃO", type="primary"):
-                # Validar assinatura
-                if canvas_result.image_data is None:
-                    st.error("Por favor, assine o contrato antes de finalizar.")
-                else:
-                    # Converter assinatura para base64
-                    from PIL import Image
-                    import io
-                    
-                    img = Image.fromarray(canvas_result.image_data.astype('uint8'), 'RGBA')
-                    buffered = io.BytesIO()
-                    img.save(buffered, format="PNG")
-                    signature_base64 = base64.b64encode(buffered.getvalue()).decode()
-                    signature_data = f"data:image/png;base64,{signature_base64}"
-                    
-                    # Salvar no banco de dados
-                    contract_number = db.create_contract(
-                        nome=st.session_state.form_data['nome'],
-                        nif=st.session_state.form_data['nif'],
-                        whatsapp=st.session_state.form_data['whatsapp'],
-                        email=st.session_state.form_data['email'],
-                        endereco=st.session_state.form_data['endereco'],
-                        plano=st.session_state.form_data['plano'],
-                        signature_data=signature_data
-                    )
-                    
-                    st.session_state.contract_number = contract_number
-                    st.session_state.step = 'success'
-                    st.rerun()
+        # Canvas e botões num fragmento: cada traço só re-executa o fragmento
+        signature_pad()
     
     # ============================================
     # STEP 4: SUCESSO
@@ -682,21 +923,19 @@ else:
         
         st.markdown("<br>", unsafe_allow_html=True)
         
-        # Gerar PDF para download
-        contract_data = db.get_contract_by_number(st.session_state.contract_number)
-        if contract_data:
-            contract_data['numero_contrato'] = contract_data['contract_number']
-            
-            # Injetar dados da contratada do banco para o PDF final
-            contratada_info = {
-                'contratada_nome': db.get_setting('contratada_nome'),
-                'contratada_nif': db.get_setting('contratada_nif'),
-                'contratada_endereco': db.get_setting('contratada_endereco')
-            }
-            contract_data.update(contratada_info)
-            
-            pdf_bytes = generate_contract_pdf(contract_data)
-            
+        # PDF para download (gerado em segundo plano e reutilizado do cache nos reruns)
+        try:
+            with st.spinner("A preparar o seu contrato..."):
+                pdf_bytes = render_queue.get_pdf(st.session_state.contract_number, timeout=PDF_WAIT_SECONDS)
+        except FuturesTimeoutError:
+            pdf_bytes = None
+            st.info("⏳ O seu contrato ainda está a ser gerado.")
+            if st.button("🔄 Atualizar"):
+                st.rerun()
+        except Exception as e:
+            print(f"Erro ao gerar PDF: {e}")
+            pdf_bytes = b''
+        if pdf_bytes is not None:
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
                 # Usar st.download_button nativo do Streamlit (mais confiável)
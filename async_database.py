@@ -0,0 +1,146 @@
+"""
+Acesso assíncrono ao banco de dados (asyncio)
+
+AsyncDatabase expõe os métodos de Database como corrotinas. As leituras correm
+num pool de threads de leitura (WAL: não bloqueiam nem são bloqueadas pelo
+escritor); as escritas correm todas numa única thread, por ordem de chegada,
+e por isso nunca disputam o lock de escrita do SQLite entre si. A thread de
+escrita tem uma conexão própria, fora do pool: nunca espera pelos leitores.
+Cada leitor ocupa uma conexão do pool, por isso readers não pode passar de
+db.pool_size (e quem mais usar o mesmo Database - ex.: PDFs - precisa de
+pool_size maior).
+
+Cada executor aceita no máximo max_pending trabalhos; acima disso a chamada
+levanta Overloaded em vez de acumular pedidos sem limite.
+
+Com group_commit (group_commit.GroupCommitWriter), create_contract passa pelo
+escritor em group commit: as adesões em rajada são gravadas em lotes.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from contract_text import CatalogoPlanos
+from database import POOL_SIZE, Database
+
+if TYPE_CHECKING:
+    from group_commit import GroupCommitWriter
+
+READER_THREADS = POOL_SIZE  # Uma conexão do pool por leitor (o escritor tem a sua)
+MAX_PENDING = 256
+
+
+class Overloaded(Exception):
+    """A fila do executor está cheia"""
+
+
+class BoundedExecutor:
+    """Pool de threads com no máximo max_pending trabalhos (a correr ou à espera)"""
+
+    def __init__(self, workers: int, max_pending: int, name: str, initializer: Optional[Callable] = None):
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix=name, initializer=initializer)
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Executa func no pool; levanta Overloaded se a fila estiver cheia"""
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, partial(func, *args, **kwargs))
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class AsyncDatabase:
+    def __init__(
+        self,
+        db: Database,
+        readers: int = READER_THREADS,
+        max_pending: int = MAX_PENDING,
+        group_commit: Optional['GroupCommitWriter'] = None
+    ):
+        if readers > db.pool_size:
+            raise ValueError(f"{readers} leitores não cabem no pool de {db.pool_size} conexões")
+        self.db = db
+        self._readers = BoundedExecutor(readers, max_pending, 'db-read')
+        self._writer = BoundedExecutor(1, max_pending, 'db-write', initializer=db.open_thread_connection)
+        self._group_commit = group_commit
+
+    def close(self):
+        """Espera pelos trabalhos pendentes e fecha as conexões"""
+        if self._group_commit is not None:
+            self._group_commit.close()
+        self._writer.shutdown()
+        self._readers.shutdown()
+        self.db.close()
+
+    # Escritas (thread única)
+
+    async def create_contract(
+        self,
+        nome: str,
+        nif: str,
+        whatsapp: str,
+        email: str,
+        endereco: str,
+        plano: str,
+        signature_data: Union[str, bytes, None] = None
+    ) -> str:
+        if self._group_commit is not None:
+            return await asyncio.wrap_future(self._group_commit.submit(
+                nome, nif, whatsapp, email, endereco, plano, signature_data
+            ))
+        return await self._writer.run(
+            self.db.create_contract, nome, nif, whatsapp, email, endereco, plano, signature_data
+        )
+
+    async def create_contracts(self, contracts: Iterable[Dict]) -> List[str]:
+        return await self._writer.run(self.db.create_contracts, list(contracts))
+
+    async def set_setting(self, key: str, value: str):
+        await self._writer.run(self.db.set_setting, key, value)
+
+    async def set_settings(self, values: Dict[str, str]):
+        await self._writer.run(self.db.set_settings, dict(values))
+
+    async def save_plan(self, nome: str, values: Dict) -> int:
+        return await self._writer.run(self.db.save_plan, nome, dict(values))
+
+    # Leituras (pool de leitura)
+
+    async def get_contract_by_number(self, contract_number: str, with_signature: bool = False) -> Optional[Dict]:
+        return await self._readers.run(self.db.get_contract_by_number, contract_number, with_signature)
+
+    async def search_contracts(self, name: str) -> List[Dict]:
+        return await self._readers.run(self.db.search_contracts, name)
+
+    async def get_all_contracts(self) -> List[Dict]:
+        return await self._readers.run(self.db.get_all_contracts)
+
+    async def get_contracts_page(
+        self,
+        page_size: int = 50,
+        cursor: Optional[Tuple[str, int]] = None,
+        search: Optional[str] = None
+    ) -> Dict:
+        return await self._readers.run(self.db.get_contracts_page, page_size, cursor, search)
+
+    async def get_signature(self, signature_hash: Optional[str]) -> Optional[bytes]:
+        return await self._readers.run(self.db.get_signature, signature_hash)
+
+    async def get_settings(self) -> Dict[str, str]:
+        return await self._readers.run(self.db.get_settings)
+
+    async def get_setting(self, key: str) -> str:
+        return await self._readers.run(self.db.get_setting, key)
+
+    async def get_settings_version(self) -> int:
+        return await self._readers.run(self.db.get_settings_version)
+
+    async def get_plan_catalog(self) -> CatalogoPlanos:
+        return await self._readers.run(self.db.get_plan_catalog)
@@ -0,0 +1,124 @@
+"""
+Geração em lote de PDFs de contratos num arquivo ZIP
+
+Os PDFs são gerados num pool de processos e escritos no ZIP à medida que ficam
+prontos. Só há no máximo 2 PDFs por worker em memória ao mesmo tempo.
+
+Uso: python batch_pdf.py --month 2025-03 -o contratos-2025-03.zip [--workers 4] [--db contratos.db]
+     python batch_pdf.py CTR-2025-0001 CTR-2025-0002 -o contratos.zip
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import BinaryIO, Callable, List, Optional, Tuple
+
+from database import Database
+from pdf_cache import PDFCache
+
+# Cache de PDFs de cada processo do pool (criado em _init_worker)
+_worker_cache: Optional[PDFCache] = None
+
+
+def _init_worker(db_name: str):
+    global _worker_cache
+    _worker_cache = PDFCache(Database(db_name))
+
+
+def _render(contract_number: str) -> Tuple[str, Optional[bytes]]:
+    return contract_number, _worker_cache.get_contract_pdf(contract_number)
+
+
+def month_range(month: str) -> Tuple[str, str]:
+    """'2025-03' -> ('2025-03-01', '2025-04-01'); levanta ValueError se o mês for inválido"""
+    year, month_number = (int(part) for part in month.split('-'))
+    if not 1 <= month_number <= 12:
+        raise ValueError(f"mês inválido: {month}")
+    if month_number == 12:
+        return f"{year}-12-01", f"{year + 1}-01-01"
+    return f"{year}-{month_number:02d}-01", f"{year}-{month_number + 1:02d}-01"
+
+
+def render_contracts_zip(
+    db_name: str,
+    contract_numbers: List[str],
+    out: BinaryIO,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> int:
+    """
+    Gera os PDFs dos contratos em paralelo e escreve-os em out como ZIP
+    progress(concluídos, total) é chamado a cada PDF escrito
+    Retorna o número de PDFs incluídos no arquivo
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    total = len(contract_numbers)
+    pending_numbers = iter(contract_numbers)
+    written = 0
+    done = 0
+
+    # spawn: não herdar threads/conexões do processo pai (ex.: servidor Streamlit)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(db_name,)) as pool, \
+            zipfile.ZipFile(out, 'w', zipfile.ZIP_STORED) as archive:  # PDFs já vêm comprimidos
+        in_flight = set()
+
+        def submit_next():
+            for contract_number in pending_numbers:
+                in_flight.add(pool.submit(_render, contract_number))
+                return
+
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                in_flight.discard(future)
+                contract_number, pdf_bytes = future.result()
+                if pdf_bytes:
+                    archive.writestr(f"{contract_number}.pdf", pdf_bytes)
+                    written += 1
+                else:
+                    print(f"Erro ao gerar PDF do contrato {contract_number}")
+                done += 1
+                if progress:
+                    progress(done, total)
+                submit_next()
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um ZIP com os PDFs de vários contratos")
+    parser.add_argument('contracts', nargs='*', help="números dos contratos")
+    parser.add_argument('--month', help="todos os contratos do mês (AAAA-MM)")
+    parser.add_argument('-o', '--output', required=True, help="ficheiro ZIP de destino")
+    parser.add_argument('--workers', type=int, help="processos em paralelo (padrão: número de CPUs)")
+    parser.add_argument('--db', default='contratos.db', help="banco de dados SQLite")
+    args = parser.parse_args()
+
+    contract_numbers = list(args.contracts)
+    if args.month:
+        try:
+            start, end = month_range(args.month)
+        except ValueError:
+            parser.error(f"mês inválido: {args.month} (use AAAA-MM)")
+        contract_numbers += Database(args.db).get_contract_numbers_between(start, end)
+    if not contract_numbers:
+        parser.error("nenhum contrato selecionado (indique números ou --month)")
+
+    def show_progress(done, total):
+        print(f"\r{done}/{total} PDFs", end='', flush=True)
+
+    with open(args.output, 'wb') as out:
+        written = render_contracts_zip(args.db, contract_numbers, out, args.workers, show_progress)
+    print(f"\n{written} PDFs escritos em {args.output}")
+    return 0 if written == len(contract_numbers) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
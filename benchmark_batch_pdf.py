@@ -0,0 +1,95 @@
+"""
+Benchmark da geração em lote de PDFs (batch_pdf.render_contracts_zip)
+
+Cria uma base temporária com --contracts contratos sintéticos (gerador com
+semente fixa, para todas as execuções terem os mesmos dados, com assinatura)
+e gera o ZIP de todos eles com 1 até --max-workers processos. Antes de cada
+medição o cache de PDFs é esvaziado, para que todos os PDFs sejam gerados.
+Mostra o tempo de cada execução (melhor de --repeat), os PDFs por segundo e o
+ganho em relação a um só worker.
+
+Uso: python benchmark_batch_pdf.py [--contracts 200] [--max-workers N] [--repeat 2]
+"""
+import argparse
+import base64
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from batch_pdf import render_contracts_zip
+from database import Database
+
+NOMES = ['João', 'Maria', 'Ana', 'Gonçalo', 'Inês', 'José', 'Beatriz', 'Tomás', 'Leonor', 'André']
+APELIDOS = ['Silva', 'Santos', 'Gonçalves', 'Conceição', 'Simões', 'Magalhães', 'Ribeiro', 'Sampaio']
+PLANOS = ['BASIC - Semestral', 'BASIC - Anual', 'PREMIUM - Semestral', 'PREMIUM - Anual']
+
+
+def signature(rng: random.Random) -> str:
+    """Assinatura PNG em base64, como a que vem do canvas do app"""
+    image = Image.new('RGBA', (400, 150), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(image)
+    points = [(x, 75 + rng.randint(-40, 40)) for x in range(20, 380, 20)]
+    draw.line(points, fill=(0, 0, 0, 255), width=3)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def seed(db: Database, count: int) -> list:
+    """Grava count contratos sintéticos e retorna os números"""
+    rng = random.Random(42)
+    signatures = [signature(rng) for _ in range(10)]
+    return db.create_contracts([
+        dict(
+            nome=f"{rng.choice(NOMES)} {rng.choice(APELIDOS)}", nif=str(rng.randrange(10 ** 8, 10 ** 9)),
+            whatsapp=f"+351 9{rng.randrange(10 ** 8):08d}", email=f"cliente{i}@exemplo.pt",
+            endereco=f"Rua {rng.choice(APELIDOS)} {i}, Porto", plano=rng.choice(PLANOS),
+            signature_data=rng.choice(signatures),
+        )
+        for i in range(count)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a geração do ZIP de PDFs com 1..N workers")
+    parser.add_argument('--contracts', type=int, default=200, help="contratos na base sintética")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help="maior número de workers medido")
+    parser.add_argument('--repeat', type=int, default=2, help="execuções por medição (conta a melhor)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'lote.db')
+        db = Database(db_path)
+        numbers = seed(db, args.contracts)
+        zip_path = os.path.join(tmp, 'lote.zip')
+
+        print(f"{len(numbers)} contratos, {os.cpu_count()} CPUs")
+        print(f"{'workers':>7} {'segundos':>9} {'PDFs/s':>8} {'ganho':>7} {'ZIP KB':>8}")
+        baseline = None
+        for workers in range(1, args.max_workers + 1):
+            best = float('inf')
+            for _ in range(args.repeat):
+                with db.transaction() as conn:
+                    conn.execute('DELETE FROM pdf_cache')
+                started = time.perf_counter()
+                with open(zip_path, 'wb') as out:
+                    written = render_contracts_zip(db_path, numbers, out, workers)
+                best = min(best, time.perf_counter() - started)
+                if written != len(numbers):
+                    print(f"FALHA: {written} de {len(numbers)} PDFs no ZIP")
+                    db.close()
+                    return 1
+            baseline = baseline or best
+            print(f"{workers:7} {best:9.2f} {len(numbers) / best:8.1f} {baseline / best:6.2f}x "
+                  f"{os.path.getsize(zip_path) / 1024:8.0f}")
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark do pool de conexões do Database
+
+Mede o custo por chamada de uma consulta curta (a configuração
+contratada_nome) com três formas de obter a conexão:
+- connect por chamada: sqlite3.connect + consulta + close (o código antigo);
+- connect + pragmas por chamada: uma conexão nova configurada como as do pool;
+- pool: Database.connection(), reutilizando conexões e statements preparados.
+Corre numa cópia do banco, para não alterar o original.
+
+Uso: python benchmark_connections.py [--calls 2000] [--db contratos.db]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from database import Database
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERY = 'SELECT value FROM settings WHERE key = ?'
+
+
+def per_call(calls: int, func: Callable[[], None]) -> float:
+    """Microssegundos por chamada (melhor de 3 repetições)"""
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return best / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara conexões por chamada com o pool do Database")
+    parser.add_argument('--calls', type=int, default=2000, help="chamadas por medição")
+    parser.add_argument('--db', default=os.path.join(APP_DIR, 'contratos.db'), help="banco copiado para o teste")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'contratos.db')
+        if os.path.exists(args.db):
+            shutil.copy(args.db, db_path)
+        db = Database(db_path)
+
+        def connect_per_call():
+            conn = sqlite3.connect(db_path)
+            conn.execute(QUERY, ('contratada_nome',)).fetchone()
+            conn.close()
+
+        def configured_per_call():
+            conn = db.get_connection()
+            conn.execute(QUERY, ('contratada_nome',)).fetchone()
+            conn.close()
+
+        def pooled():
+            with db.connection() as conn:
+                conn.execute(QUERY, ('contratada_nome',)).fetchone()
+
+        results = [
+            ('connect por chamada', per_call(args.calls, connect_per_call)),
+            ('connect + pragmas', per_call(args.calls, configured_per_call)),
+            ('pool', per_call(args.calls, pooled)),
+        ]
+        db.close()
+
+    pool_us = results[-1][1]
+    print(f"{'conexão':22} {'µs/chamada':>11} {'vs pool':>8}")
+    for name, us in results:
+        print(f"{name:22} {us:11.1f} {us / pool_us:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
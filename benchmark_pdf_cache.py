@@ -0,0 +1,80 @@
+"""
+Benchmark do cache de PDFs (pdf_cache.PDFCache): download frio contra quente
+
+Numa cópia do banco, esvazia o cache e pede o PDF de cada contrato duas vezes
+com PDFCache.get_contract_pdf: a primeira gera o PDF (frio), a segunda lê-o
+do cache (quente). Mostra a mediana e o p95 de cada caso e confirma que os
+bytes servidos do cache são os mesmos que foram gerados.
+
+Uso: python benchmark_pdf_cache.py [--limit 0] [--db contratos.db]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+from database import Database
+from pdf_cache import PDFCache
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara downloads de PDF sem e com cache")
+    parser.add_argument('--limit', type=int, default=0, help="contratos medidos (0: todos)")
+    parser.add_argument('--db', default=os.path.join(APP_DIR, 'contratos.db'), help="banco copiado para o teste")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'contratos.db')
+        if os.path.exists(args.db):
+            shutil.copy(args.db, db_path)
+        db = Database(db_path)
+        with db.transaction() as conn:
+            conn.execute('DELETE FROM pdf_cache')
+
+        numbers = [contract['contract_number'] for contract in db.get_all_contracts()]
+        if not numbers:
+            numbers = [db.create_contract(
+                'Cliente Inicial', '123456789', '+351 910 000 000', 'inicial@exemplo.pt', 'Rua A', 'BASIC - Anual'
+            )]
+        if args.limit:
+            numbers = numbers[:args.limit]
+
+        import pdf_generator  # noqa: F401 - o import (fpdf) não entra na primeira medição
+
+        cache = PDFCache(db)
+        cold, warm = [], []
+        mismatches = 0
+        for number in numbers:
+            started = time.perf_counter()
+            generated = cache.get_contract_pdf(number)
+            cold.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            cached = cache.get_contract_pdf(number)
+            warm.append((time.perf_counter() - started) * 1000)
+            mismatches += generated != cached
+        db.close()
+
+    print(f"{len(numbers)} contratos; cache: {cache.stats()['hits']} hits, {cache.stats()['misses']} misses")
+    print(f"{'download':8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, values in (('frio', cold), ('quente', warm)):
+        print(f"{name:8} {percentile(values, 0.5):8.2f} {percentile(values, 0.95):8.2f}")
+    print(f"quente {percentile(cold, 0.5) / percentile(warm, 0.5):.0f}x mais rápido (mediana)")
+    if mismatches:
+        print(f"FALHA: {mismatches} PDF(s) do cache diferentes dos gerados")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Benchmark da geração de PDFs a partir de moldes (pdf_generator._get_molde)
+
+Numa cópia do banco, gera o PDF de todos os contratos de três formas:
+- completo: sem molde, o documento inteiro desenhado por contrato;
+- primeira passagem: cache de moldes vazio (inclui a construção dos moldes);
+- moldes quentes: cada contrato só preenche os dados do cliente e assina.
+Mostra a média por contrato de cada forma (melhor de --repeat passagens).
+
+Uso: python benchmark_pdf_templates.py [--repeat 3] [--db contratos.db]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+import pdf_generator
+from database import Database
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_contracts(db: Database) -> List[dict]:
+    """Dados de cada contrato tal como o PDFCache os passa a generate_contract_pdf"""
+    contracts = []
+    settings = db.get_settings()
+    for contract in db.get_all_contracts():
+        data = db.get_contract_by_number(contract['contract_number'])
+        data['signature_data'] = db.get_signature(data['signature_hash'])
+        data['numero_contrato'] = data['contract_number']
+        data['texto'] = db.get_template(data['template_version_id'])
+        data.update(settings)
+        contracts.append(data)
+    return contracts
+
+
+def per_contract(contracts: List[dict], catalogo, repeat: int, before_pass: Callable[[], None]) -> float:
+    """ms por contrato na melhor de repeat passagens; before_pass corre antes de cada uma"""
+    best = float('inf')
+    for _ in range(repeat):
+        before_pass()
+        started = time.perf_counter()
+        for data in contracts:
+            if not pdf_generator.generate_contract_pdf(data, catalogo, data['texto']):
+                raise RuntimeError(f"falha ao gerar {data['contract_number']}")
+        best = min(best, time.perf_counter() - started)
+    return best / len(contracts) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a geração completa de PDFs com a geração por moldes")
+    parser.add_argument('--repeat', type=int, default=3, help="passagens por medição (conta a melhor)")
+    parser.add_argument('--db', default=os.path.join(APP_DIR, 'contratos.db'), help="banco copiado para o teste")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'contratos.db')
+        if os.path.exists(args.db):
+            shutil.copy(args.db, db_path)
+        db = Database(db_path)
+        contracts = load_contracts(db)
+        catalogo = db.get_plan_catalog()
+        db.close()
+    if not contracts:
+        print("O banco não tem contratos")
+        return 1
+
+    # Aquecer imports e fontes fora das medições
+    pdf_generator.generate_contract_pdf(contracts[0], catalogo, contracts[0]['texto'])
+
+    chave_molde = pdf_generator._chave_molde
+    pdf_generator._chave_molde = lambda *args: None  # Sem molde: documento completo
+    try:
+        completo = per_contract(contracts, catalogo, args.repeat, lambda: None)
+    finally:
+        pdf_generator._chave_molde = chave_molde
+
+    primeira = per_contract(contracts, catalogo, args.repeat, pdf_generator._moldes.clear)
+    moldes = len(pdf_generator._moldes)
+    quente = per_contract(contracts, catalogo, args.repeat, lambda: None)
+
+    print(f"{len(contracts)} contratos, {moldes} moldes")
+    print(f"{'geração':20} {'ms/contrato':>12}")
+    print(f"{'completa':20} {completo:12.1f}")
+    print(f"{'primeira passagem':20} {primeira:12.1f}")
+    print(f"{'moldes quentes':20} {quente:12.1f}  ({completo / quente:.1f}x mais rápido)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark da busca de contratos: índice FTS5 contra o LIKE antigo
+
+Enche uma base temporária com contratos sintéticos até cada tamanho de
+--sizes e mede search_contracts com o FTS5 (fts_enabled) e com o LIKE em
+nome usado quando o SQLite não tem FTS5. Os mesmos nomes são procurados nos
+dois modos (o LIKE com acentos, como estão gravados; o FTS sem acentos): um
+apelido com número (muitos resultados) e o nome completo de um contrato a meio
+da base (poucos).
+
+Uso: python benchmark_search.py [--sizes 10000,100000,1000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import unicodedata
+from typing import List, Tuple
+
+from database import Database
+
+NOMES = ['João', 'Maria', 'Ana', 'Gonçalo', 'Inês', 'José', 'Beatriz', 'Tomás', 'Leonor', 'André']
+APELIDOS = ['Silva', 'Santos', 'Gonçalves', 'Conceição', 'Simões', 'Magalhães', 'Ribeiro', 'Sampaio']
+CIDADES = ['Porto', 'Gaia', 'Matosinhos', 'Braga', 'Lisboa', 'Aveiro']
+PLANOS = ['BASIC - Semestral', 'BASIC - Anual', 'PREMIUM - Semestral', 'PREMIUM - Anual']
+FILL_BATCH = 10000
+
+
+def sem_acentos(texto: str) -> str:
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if not unicodedata.combining(c)).lower()
+
+
+def queries(db: Database, size: int) -> List[Tuple[str, str]]:
+    """(texto para o FTS, texto para o LIKE em nome) de cada busca medida"""
+    with db.connection() as conn:
+        nome = conn.execute('SELECT nome FROM contracts WHERE id = ?', (size // 2,)).fetchone()[0]
+    return [(sem_acentos('Gonçalves 77'), 'Gonçalves 77'), (sem_acentos(nome), nome)]
+
+
+def fill(db: Database, start: int, end: int, rng: random.Random):
+    """Insere os contratos start..end-1 (os triggers mantêm o índice FTS)"""
+    for batch_start in range(start, end, FILL_BATCH):
+        rows = []
+        for i in range(batch_start, min(end, batch_start + FILL_BATCH)):
+            rows.append((
+                f"CTR-2000-{i + 1:07d}", f"{rng.choice(NOMES)} {rng.choice(APELIDOS)} {i}",
+                str(rng.randrange(10 ** 8, 10 ** 9)), f"+351 9{rng.randrange(10 ** 8):08d}",
+                f"cliente{i}@exemplo.pt", f"Rua {rng.choice(APELIDOS)} {i % 500}, {rng.choice(CIDADES)}",
+                rng.choice(PLANOS),
+            ))
+        with db.transaction() as conn:
+            conn.executemany('''
+                INSERT INTO contracts (contract_number, nome, nif, whatsapp, email, endereco, plano)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+
+def time_search(db: Database, query: str, repeat: int) -> Tuple[float, int]:
+    """(ms por busca, a mediana de repeat execuções; número de resultados)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = db.search_contracts(query)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a busca FTS5 com o LIKE em bases sintéticas")
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="tamanhos da base, separados por vírgula")
+    parser.add_argument('--repeat', type=int, default=20, help="buscas por medição (conta a mediana)")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'busca.db'))
+        if not db.fts_enabled:
+            print("Este SQLite não tem FTS5: só há o LIKE para medir")
+            return 1
+
+        rng = random.Random(42)
+        print(f"{'contratos':>10}  {'busca':26} {'FTS ms':>8} {'LIKE ms':>8} {'resultados FTS/LIKE':>20}")
+        filled = 0
+        for size in sizes:
+            started = time.perf_counter()
+            fill(db, filled, size, rng)
+            filled = size
+            fill_seconds = time.perf_counter() - started
+
+            for fts_query, like_query in queries(db, size):
+                db.fts_enabled = True
+                fts_ms, fts_count = time_search(db, fts_query, args.repeat)
+                db.fts_enabled = False
+                like_ms, like_count = time_search(db, like_query, args.repeat)
+                db.fts_enabled = True
+                print(f"{size:10}  {fts_query:26} {fts_ms:8.2f} {like_ms:8.2f} {f'{fts_count}/{like_count}':>20}")
+            print(f"{'':10}  (enchimento até {size}: {fill_seconds:.1f} s)")
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Teste de stress da numeração dos contratos (contract_sequences)
+
+Corre --processes processos com --threads threads cada, todos a criar
+contratos no mesmo ficheiro de banco (create_contract e, em parte dos
+pedidos, create_contracts em lotes). Verifica que os números entregues são
+únicos, que estão todos gravados e que formam uma sequência sem buracos
+(CTR-AAAA-0001 .. CTR-AAAA-N). Termina com código 1 se alguma verificação falhar.
+
+Uso: python check_contract_numbers.py [--processes 6] [--threads 8] [--contracts 50]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+from database import Database
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_SIZE = 5  # Cada thread cria um lote com create_contracts a cada BATCH_SIZE contratos
+
+# Executado em cada processo: imprime os números entregues, um por linha
+CHILD = '''
+import sys, threading
+from database import Database
+db_path, threads, contracts, batch_size = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+db = Database(db_path)
+lock = threading.Lock()
+numbers = []
+errors = []
+contract = dict(nome='Cliente Stress', nif='123456789', whatsapp='+351 910 000 000',
+                email='stress@exemplo.pt', endereco='Rua S, Porto', plano='BASIC - Anual')
+def client():
+    created = []
+    try:
+        while len(created) < contracts:
+            if len(created) % (batch_size * 2) == batch_size:
+                count = min(batch_size, contracts - len(created))
+                created += db.create_contracts([contract] * count)
+            else:
+                created.append(db.create_contract(**contract))
+    except Exception as e:
+        errors.append(repr(e))
+    with lock:
+        numbers.extend(created)
+workers = [threading.Thread(target=client) for _ in range(threads)]
+for worker in workers:
+    worker.start()
+for worker in workers:
+    worker.join()
+db.close()
+for error in errors:
+    print('ERRO', error)
+for number in numbers:
+    print(number)
+'''
+
+NUMBER = re.compile(r'^CTR-(\d{4})-(\d{4,})$')
+
+
+def check_contract_numbers(processes: int, threads: int, contracts: int) -> List[str]:
+    """Retorna a lista de problemas encontrados (vazia se a numeração está correta)"""
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'numeros.db')
+        Database(db_path).close()  # Migrações antes dos processos
+
+        started = time.perf_counter()
+        children = [
+            subprocess.Popen(
+                [sys.executable, '-c', CHILD, db_path, str(threads), str(contracts), str(BATCH_SIZE)],
+                cwd=APP_DIR, stdout=subprocess.PIPE, text=True, env={**os.environ, 'PYTHONPATH': APP_DIR}
+            )
+            for _ in range(processes)
+        ]
+        returned = []
+        for child in children:
+            output, _ = child.communicate()
+            for line in output.splitlines():
+                if line.startswith('ERRO'):
+                    problems.append(f"erro num processo: {line[5:]}")
+                elif line.strip():
+                    returned.append(line.strip())
+        seconds = time.perf_counter() - started
+
+        conn = sqlite3.connect(db_path)
+        stored = [row[0] for row in conn.execute('SELECT contract_number FROM contracts')]
+        conn.close()
+
+    expected = processes * threads * contracts
+    print(f"{len(returned)} números entregues em {seconds:.2f} s "
+          f"({processes} processos x {threads} threads x {contracts} contratos)")
+
+    if len(returned) != expected:
+        problems.append(f"esperados {expected} números, entregues {len(returned)}")
+    duplicates = len(returned) - len(set(returned))
+    if duplicates:
+        problems.append(f"{duplicates} números repetidos")
+    if set(returned) != set(stored):
+        problems.append(f"números entregues e gravados diferem ({len(set(returned) ^ set(stored))})")
+
+    year = datetime.now().year
+    sequence = sorted(int(NUMBER.match(number).group(2)) for number in stored if NUMBER.match(number))
+    if len(sequence) != len(stored) or any(NUMBER.match(number).group(1) != str(year) for number in stored):
+        problems.append("números fora do formato CTR-AAAA-NNNN do ano corrente")
+    if sequence != list(range(1, len(sequence) + 1)):
+        missing = sorted(set(range(1, max(sequence, default=0) + 1)) - set(sequence))
+        problems.append(f"buracos na sequência: {missing[:10]}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress da numeração de contratos com vários processos e threads")
+    parser.add_argument('--processes', type=int, default=6)
+    parser.add_argument('--threads', type=int, default=8, help="threads por processo")
+    parser.add_argument('--contracts', type=int, default=50, help="contratos por thread")
+    args = parser.parse_args()
+
+    problems = check_contract_numbers(args.processes, args.threads, args.contracts)
+    for problem in problems:
+        print(f"FALHA: {problem}")
+    print("OK" if not problems else f"{len(problems)} problema(s) na numeração")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,335 @@
+"""
+Verificação do group commit (group_commit.GroupCommitWriter)
+
+Numa base temporária, verifica as garantias documentadas em group_commit.py:
+- todo número entregue está gravado, mesmo que o processo seja morto (SIGKILL)
+  a meio de uma rajada de adesões;
+- um pedido isolado é confirmado dentro de max_delay (mais o tempo do COMMIT);
+- um lote nunca passa de max_batch contratos;
+- um contrato inválido não impede a gravação dos outros do mesmo lote;
+- close() grava tudo o que já tinha sido aceite;
+- o escritor grava mesmo com o pool de conexões todo ocupado;
+- create_contract desiste ao fim de timeout e um pedido ainda na fila não é gravado;
+- se a thread do escritor morrer, os pedidos pendentes falham em vez de ficarem à espera.
+Depois compara uma rajada de adesões em --threads threads gravadas diretamente
+(Database.create_contract, um COMMIT por contrato) e em group commit.
+Termina com código 1 se alguma garantia falhar.
+
+Uso: python check_group_commit.py [--threads 16] [--contracts 1600]
+"""
+import argparse
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Callable, Dict, List
+
+from database import BUSY_TIMEOUT, Database
+from group_commit import GroupCommitWriter
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENTE = {
+    'nome': 'Cliente Rajada', 'nif': '123456789', 'whatsapp': '+351 910 000 000',
+    'email': 'rajada@exemplo.pt', 'endereco': 'Rua da Rajada, Porto', 'plano': 'BASIC - Anual',
+}
+KILL_AFTER_ACKS = 300
+DELAY_MARGIN = 0.25  # Folga (s) para o COMMIT e o escalonamento das threads
+
+# Executado noutro processo: adesões em rajada; imprime cada número depois de entregue
+CHILD = '''
+import sys, threading
+from database import BUSY_TIMEOUT, Database
+from group_commit import GroupCommitWriter
+writer = GroupCommitWriter(Database(sys.argv[1]), max_delay=0.002, synchronous_full=True)
+lock = threading.Lock()
+def client():
+    while True:
+        number = writer.create_contract('Cliente Kill', '123456789', '+351 910 000 000',
+                                        'kill@exemplo.pt', 'Rua K, Porto', 'BASIC - Anual')
+        with lock:
+            sys.stdout.write(number + '\\n')
+            sys.stdout.flush()
+threads = [threading.Thread(target=client, daemon=True) for _ in range(8)]
+for thread in threads:
+    thread.start()
+threads[0].join()
+'''
+
+
+def stored_numbers(db_path: str) -> set:
+    conn = sqlite3.connect(db_path)
+    try:
+        return {row[0] for row in conn.execute('SELECT contract_number FROM contracts')}
+    finally:
+        conn.close()
+
+
+def check_acknowledged_survive_kill(tmp: str) -> List[str]:
+    """Mata o processo a meio de uma rajada; todos os números já entregues têm de estar no banco"""
+    db_path = os.path.join(tmp, 'kill.db')
+    Database(db_path).close()  # Migrações antes da rajada
+    child = subprocess.Popen(
+        [sys.executable, '-c', CHILD, db_path], cwd=APP_DIR, stdout=subprocess.PIPE, text=True,
+        env={**os.environ, 'PYTHONPATH': APP_DIR}
+    )
+    acknowledged = []
+    for line in child.stdout:
+        acknowledged.append(line.strip())
+        if len(acknowledged) >= KILL_AFTER_ACKS:
+            child.send_signal(signal.SIGKILL)
+            break
+    acknowledged += [line.strip() for line in child.stdout if line.strip()]
+    child.wait()
+
+    missing = set(acknowledged) - stored_numbers(db_path)
+    print(f"SIGKILL depois de {len(acknowledged)} números entregues: {len(missing)} em falta no banco")
+    return [f"números entregues mas não gravados: {sorted(missing)[:5]}"] if missing else []
+
+
+def check_max_delay(tmp: str) -> List[str]:
+    """Um pedido isolado não espera mais do que max_delay pelo lote"""
+    writer = GroupCommitWriter(Database(os.path.join(tmp, 'delay.db')), max_delay=0.05)
+    try:
+        started = time.perf_counter()
+        writer.create_contract(**CLIENTE)
+        elapsed = time.perf_counter() - started
+    finally:
+        writer.close()
+        writer.db.close()
+    print(f"Pedido isolado com max_delay=50 ms: {elapsed * 1000:.1f} ms")
+    if elapsed > writer.max_delay + DELAY_MARGIN:
+        return [f"pedido isolado demorou {elapsed * 1000:.0f} ms (max_delay=50 ms)"]
+    return []
+
+
+def check_max_batch(tmp: str) -> List[str]:
+    """max_batch + 1 pedidos de uma vez dão dois COMMITs"""
+    writer = GroupCommitWriter(Database(os.path.join(tmp, 'batch.db')), max_batch=10, max_delay=0.5)
+    try:
+        futures = [writer.submit(**CLIENTE) for _ in range(11)]
+        numbers = [future.result() for future in futures]
+    finally:
+        writer.close()
+        writer.db.close()
+    print(f"11 pedidos com max_batch=10: {writer.commits} COMMITs")
+    problems = []
+    if writer.commits != 2:
+        problems.append(f"esperados 2 COMMITs com max_batch=10, houve {writer.commits}")
+    if len(set(numbers)) != len(numbers):
+        problems.append("números de contrato repetidos")
+    return problems
+
+
+def check_invalid_isolated(tmp: str) -> List[str]:
+    """Um contrato inválido (nome NULL) falha sozinho; os restantes do lote são gravados"""
+    db_path = os.path.join(tmp, 'invalid.db')
+    writer = GroupCommitWriter(Database(db_path), max_delay=0.5)
+    try:
+        futures = [writer.submit(**CLIENTE), writer.submit(**{**CLIENTE, 'nome': None}), writer.submit(**CLIENTE)]
+        errors = [future.exception() for future in futures]
+    finally:
+        writer.close()
+        writer.db.close()
+    print(f"Lote com um contrato inválido: {[type(e).__name__ if e else 'ok' for e in errors]}")
+    if not isinstance(errors[1], sqlite3.IntegrityError) or errors[0] or errors[2]:
+        return [f"o contrato inválido devia falhar sozinho: {errors}"]
+    if {futures[0].result(), futures[2].result()} - stored_numbers(db_path):
+        return ["os contratos válidos do lote não foram gravados"]
+    return []
+
+
+def check_close_flushes(tmp: str) -> List[str]:
+    """close() logo depois de submit(): todos os contratos aceites ficam gravados"""
+    db_path = os.path.join(tmp, 'close.db')
+    writer = GroupCommitWriter(Database(db_path), max_delay=1.0)
+    futures = [writer.submit(**CLIENTE) for _ in range(200)]
+    writer.close()
+    writer.db.close()
+    pending = [future for future in futures if not future.done()]
+    missing = {future.result() for future in futures if future.done()} - stored_numbers(db_path)
+    print(f"close() com 200 pedidos na fila: {len(pending)} por resolver, {len(missing)} em falta")
+    if pending or missing:
+        return ["close() não gravou todos os contratos aceites"]
+    return []
+
+
+def check_pool_independent(tmp: str) -> List[str]:
+    """Com a única conexão do pool ocupada, o escritor (conexão própria) continua a gravar"""
+    db = Database(os.path.join(tmp, 'pool.db'), pool_size=1)
+    writer = GroupCommitWriter(db)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold_pool():
+        with db.connection():
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_pool)
+    holder.start()
+    held.wait()
+    try:
+        started = time.perf_counter()
+        writer.create_contract(**CLIENTE, timeout=5)
+        elapsed = time.perf_counter() - started
+    except FuturesTimeoutError:
+        elapsed = None
+    finally:
+        release.set()
+        holder.join()
+        writer.close()
+        db.close()
+    print(f"Gravação com o pool todo ocupado: {'bloqueada' if elapsed is None else f'{elapsed * 1000:.1f} ms'}")
+    return ["o escritor ficou à espera de uma conexão do pool"] if elapsed is None else []
+
+
+def check_timeout(tmp: str) -> List[str]:
+    """Com o lock de escrita preso por outra conexão, create_contract desiste e cancela o pedido na fila"""
+    db_path = os.path.join(tmp, 'timeout.db')
+    writer = GroupCommitWriter(Database(db_path), max_batch=1)
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    blocker.execute('BEGIN IMMEDIATE')
+    problems = []
+    try:
+        first = writer.submit(**CLIENTE)  # Entra no lote e fica à espera do lock
+        time.sleep(0.1)
+        started = time.perf_counter()
+        try:
+            writer.create_contract(**{**CLIENTE, 'nome': 'Cliente Desistiu'}, timeout=0.2)
+            problems.append("create_contract não respeitou o timeout")
+        except FuturesTimeoutError:
+            elapsed = time.perf_counter() - started
+            print(f"create_contract com timeout=200 ms e o lock preso: TimeoutError em {elapsed * 1000:.0f} ms")
+    finally:
+        blocker.rollback()
+        blocker.close()
+    first.result(timeout=BUSY_TIMEOUT)
+    writer.close()
+    writer.db.close()
+
+    conn = sqlite3.connect(db_path)
+    desistiu = conn.execute("SELECT COUNT(*) FROM contracts WHERE nome = 'Cliente Desistiu'").fetchone()[0]
+    conn.close()
+    if desistiu:
+        problems.append("o pedido cancelado por timeout foi gravado")
+    return problems
+
+
+class _WriterCrash(BaseException):
+    pass
+
+
+def check_writer_death(tmp: str) -> List[str]:
+    """A thread do escritor morre a meio de um lote: os pedidos falham e submit() recusa novos"""
+    writer = GroupCommitWriter(Database(os.path.join(tmp, 'crash.db')), max_delay=0.2)
+
+    def crash(batch):
+        raise _WriterCrash()
+
+    writer._commit = crash  # Simula um erro inesperado fora de create_contracts
+    excepthook = threading.excepthook
+    threading.excepthook = lambda args: None  # O traceback da thread não interessa aqui
+    try:
+        futures = [writer.submit(**CLIENTE) for _ in range(3)]
+        errors = [future.exception(timeout=5) for future in futures]
+        writer._thread.join(5)
+    finally:
+        threading.excepthook = excepthook
+    try:
+        writer.submit(**CLIENTE)
+        refused = False
+    except RuntimeError:
+        refused = True
+    writer.db.close()
+    print(f"Escritor morto a meio de um lote: {[type(e).__name__ for e in errors]}, novos pedidos recusados: {refused}")
+    if not all(isinstance(e, RuntimeError) for e in errors) or not refused:
+        return ["os pedidos não falharam quando o escritor morreu"]
+    return []
+
+
+def burst(create: Callable[[], str], threads: int, contracts: int) -> Dict:
+    """contracts adesões repartidas por threads; retorna duração e latências"""
+    latencies = []
+    errors = []
+
+    def client(count: int):
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                create()
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(client, [contracts // threads] * threads))
+    latencies.sort()
+    return {
+        'seconds': time.perf_counter() - started, 'errors': errors,
+        'p50': latencies[len(latencies) // 2], 'p99': latencies[int(len(latencies) * 0.99)],
+    }
+
+
+def compare_burst(tmp: str, threads: int, contracts: int):
+    print(f"\nRajada de {contracts} adesões em {threads} threads (synchronous=FULL)")
+    print(f"{'modo':14} {'contratos/s':>12} {'COMMITs':>8} {'p50 ms':>8} {'p99 ms':>8} {'erros':>6}")
+    for mode in ('direto', 'group commit'):
+        db = Database(os.path.join(tmp, f"burst-{mode.replace(' ', '-')}.db"))
+        local = threading.local()
+
+        def create_direct() -> str:
+            # Como o writer em group commit: cada thread grava com synchronous=FULL
+            if not getattr(local, 'full', False):
+                with db.connection() as conn:
+                    conn.execute('PRAGMA synchronous=FULL')
+                local.full = True
+            return db.create_contract(**CLIENTE)
+
+        def create_group_commit() -> str:
+            return writer.create_contract(**CLIENTE)
+
+        writer = GroupCommitWriter(db, synchronous_full=True) if mode == 'group commit' else None
+        try:
+            result = burst(create_group_commit if writer else create_direct, threads, contracts)
+        finally:
+            if writer:
+                writer.close()
+            db.close()
+        commits = writer.commits if writer else contracts - len(result['errors'])
+        print(
+            f"{mode:14} {contracts / result['seconds']:12.0f} {commits:8} {result['p50'] * 1000:8.1f} "
+            f"{result['p99'] * 1000:8.1f} {len(result['errors']):6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica as garantias do group commit e compara com gravação direta")
+    parser.add_argument('--threads', type=int, default=16, help="threads na rajada de adesões")
+    parser.add_argument('--contracts', type=int, default=1600, help="contratos na rajada")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for check in (
+            check_acknowledged_survive_kill, check_max_delay, check_max_batch,
+            check_invalid_isolated, check_close_flushes, check_pool_independent,
+            check_timeout, check_writer_death
+        ):
+            problems += check(tmp)
+        compare_burst(tmp, args.threads, args.contracts)
+
+    for problem in problems:
+        print(f"FALHA: {problem}")
+    print("OK" if not problems else f"{len(problems)} garantia(s) não cumprida(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
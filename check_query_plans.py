@@ -0,0 +1,132 @@
+"""
+Verificação dos planos de execução das consultas do database.py
+
+Executa cada método público de Database numa base temporária, captura todas as
+instruções SQL emitidas e corre EXPLAIN QUERY PLAN sobre cada uma. Termina com
+código 1 se alguma consulta fizer um full table scan, exceto nas tabelas
+pequenas de SCAN_ALLOWED_TABLES e nos métodos de SCAN_ALLOWED_METHODS, que
+leem a tabela inteira de propósito.
+
+Uso: python check_query_plans.py
+"""
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from database import Database
+
+# Tabelas pequenas onde um scan é aceitável
+SCAN_ALLOWED_TABLES = {'sqlite_sequence', 'settings', 'contracts_fts_config'}  # _config: tabela interna do FTS5
+
+# Métodos cujo scan é esperado (método -> motivo)
+SCAN_ALLOWED_METHODS = {
+    'iter_contracts': "exportação: percorre todos os contratos por id",
+    'migrate_signatures': "migração única das assinaturas guardadas em texto",
+}
+
+EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT|WITH)\b', re.IGNORECASE)
+FULL_SCAN = re.compile(r'^SCAN (?:\w+\.)?(\w+)(?!.*\bUSING\b)(?!.*\bVIRTUAL TABLE\b)')
+
+
+class TracedDatabase(Database):
+    """Database que regista todas as instruções SQL executadas"""
+
+    def __init__(self, *args, **kwargs):
+        self.statements: List[Tuple[Optional[str], str]] = []  # (método de SCAN_ALLOWED_METHODS, sql)
+        self.method: Optional[str] = None
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self) -> sqlite3.Connection:
+        conn = super().get_connection()
+        conn.set_trace_callback(lambda sql: self.statements.append((self.method, sql)))
+        return conn
+
+    @contextmanager
+    def calling(self, method: str):
+        """Marca as instruções emitidas dentro do bloco como sendo do método"""
+        self.method = method
+        try:
+            yield
+        finally:
+            self.method = None
+
+
+def exercise(db: Database):
+    """Chama todos os métodos de consulta/escrita usados pela aplicação"""
+    contract_number = db.create_contract(
+        nome='João Teste', nif='123456789', whatsapp='+351 912 345 678',
+        email='joao@exemplo.pt', endereco='Rua A, Porto', plano='BASIC - Anual',
+        signature_data=b'\x89PNG assinatura'
+    )
+    db.generate_contract_number()
+    db.create_contracts([{
+        'nome': 'Maria Legado', 'nif': '987654321', 'whatsapp': '+351 913 000 000',
+        'email': 'maria@exemplo.pt', 'endereco': 'Rua B, Gaia', 'plano': 'PREMIUM - Anual',
+        'created_at': '2024-03-01 10:00:00'
+    }])
+    db.get_all_contracts()
+    with db.calling('iter_contracts'):
+        list(db.iter_contracts(include_signature=True))
+    with db.calling('migrate_signatures'):
+        db.migrate_signatures()
+    db.search_contracts('joao')
+    db.get_contract_numbers_between('2024-03-01', '2024-04-01')
+    page = db.get_contracts_page(page_size=1)
+    db.get_contracts_page(page_size=1, cursor=page['next_cursor'] or ('9999', 0))
+    db.get_contracts_page(page_size=1, search='porto')
+    contract = db.get_contract_by_number(contract_number, with_signature=True)
+    db.get_signature(contract['signature_hash'])
+    db.get_template(contract['template_version_id'])
+    db.store_cached_pdf('chave', contract_number, b'%PDF', max_bytes=1)
+    db.get_cached_pdf('chave')
+    db.get_settings_version()
+    db.get_settings()
+    db.get_setting('contratada_nome')
+    db.set_setting('contratada_nome', 'MICAELA SAMPAIO')
+    db.set_settings({'contratada_nif': 'NIF_PENDENTE'})
+    db.get_plans_version()
+    db.get_plan_catalog()
+    db.save_plan('BASIC - Anual', {'valor_mensal': 65})
+    db.get_plan_catalog()
+
+
+def check_query_plans() -> List[Tuple[str, str]]:
+    """Retorna a lista de (consulta, plano) que fazem full table scan não permitido"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plans.db')
+        db = TracedDatabase(db_path)
+        db.statements.clear()  # Ignorar migrações (executadas uma única vez)
+        exercise(db)
+        statements = list(dict.fromkeys(db.statements))
+        db.close()
+
+        conn = sqlite3.connect(db_path)
+        failures = []
+        for method, sql in statements:
+            if not EXPLAINABLE.match(sql):
+                continue
+            plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+            for row in plan:
+                detail = row[3]
+                match = FULL_SCAN.match(detail)
+                if not match or match.group(1) in SCAN_ALLOWED_TABLES:
+                    continue
+                if method in SCAN_ALLOWED_METHODS:
+                    print(f"scan permitido ({method}: {SCAN_ALLOWED_METHODS[method]}): {detail}")
+                else:
+                    failures.append((' '.join(sql.split()), detail))
+        conn.close()
+
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_query_plans()
+    for sql, detail in failures:
+        print(f"FULL SCAN: {detail}\n    {sql}")
+    print("OK" if not failures else f"{len(failures)} consulta(s) com full table scan")
+    sys.exit(1 if failures else 0)
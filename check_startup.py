@@ -0,0 +1,131 @@
+"""
+Verificação do tempo de arranque (cold start) da aplicação
+
+Corre a primeira página do fluxo do cliente num interpretador novo, com
+python -X importtime, e mede o tempo dos imports da própria aplicação e a
+latência do primeiro render. O Streamlit e o harness de testes (AppTest) são
+carregados e aquecidos antes, com um script vazio, para que só contem os
+imports feitos pelo app.py. Termina com código 1 se algum passar do orçamento
+ou se um módulo pesado (pandas, fpdf, PIL) for importado no arranque.
+
+Uso: python check_startup.py [--runs 3] [--import-budget-ms 500] [--render-budget-ms 350]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Orçamentos do arranque (ms), medidos com -X importtime (que acrescenta algum custo)
+IMPORT_BUDGET_MS = 100   # Só os imports do app.py (o Streamlit já está carregado)
+FIRST_RENDER_BUDGET_MS = 350
+
+# Módulos que só devem ser carregados quando são usados (área admin, geração de PDFs)
+LAZY_MODULES = ('pandas', 'fpdf', 'PIL', 'pyarrow', 'streamlit_drawable_canvas')
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+APP_IMPORTS_MARKER = '--- imports do app.py ---'
+
+# Executado no interpretador novo, com o diretório de trabalho numa cópia do banco
+PROBE = '''
+import json, os, sys, tempfile, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+# Aquecer o Streamlit e o AppTest com um script vazio: os imports deles não contam
+with tempfile.TemporaryDirectory() as tmp:
+    vazio = os.path.join(tmp, 'vazio.py')
+    with open(vazio, 'w') as f:
+        f.write('import streamlit as st\\nst.write("")\\n')
+    AppTest.from_file(vazio, default_timeout=60).run()
+harness_ms = (time.perf_counter() - started) * 1000
+sys.stderr.write(%r + '\\n')
+sys.stderr.flush()
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+render_started = time.perf_counter()
+at.run()
+finished = time.perf_counter()
+print(json.dumps({
+    'render_ms': (finished - render_started) * 1000,
+    'total_ms': (finished - started) * 1000,
+    'harness_ms': harness_ms,
+    'errors': [str(e.value) for e in at.exception],
+    'loaded': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+''' % APP_IMPORTS_MARKER
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, float]]:
+    """
+    (módulo, ms cumulativos) dos imports de primeiro nível feitos depois do
+    marcador (os do app.py), do mais lento para o mais rápido
+    """
+    top_level = []
+    for line in stderr.split(APP_IMPORTS_MARKER, 1)[-1].splitlines():
+        match = IMPORT_TIME.match(line)
+        if match and not match.group(3):
+            top_level.append((match.group(4), int(match.group(2)) / 1000))
+    return sorted(top_level, key=lambda item: item[1], reverse=True)
+
+
+def measure_startup(workdir: str) -> Dict:
+    """Arranca a aplicação uma vez num interpretador novo e retorna as medições"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, os.path.join(APP_DIR, 'app.py'), *LAZY_MODULES],
+        cwd=workdir, capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONPATH': APP_DIR}
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(result.stderr)
+    report['import_ms'] = sum(ms for _, ms in imports)
+    report['slowest_imports'] = imports[:5]
+    return report
+
+
+def check_startup(runs: int, import_budget_ms: float, render_budget_ms: float) -> List[str]:
+    """Retorna a lista de problemas encontrados (vazia se o arranque está dentro do orçamento)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # Cópia do banco; a primeira execução (não medida) aplica as migrações pendentes
+        db_path = os.path.join(APP_DIR, 'contratos.db')
+        if os.path.exists(db_path):
+            shutil.copy(db_path, tmp)
+        shutil.copytree(os.path.join(APP_DIR, 'assets'), os.path.join(tmp, 'assets'))
+        measure_startup(tmp)
+
+        # Melhor de várias execuções (menos sensível a ruído da máquina)
+        reports = [measure_startup(tmp) for _ in range(runs)]
+
+    best = min(reports, key=lambda report: report['total_ms'])
+    print(f"Streamlit + AppTest (fora do orçamento): {best['harness_ms']:.0f} ms")
+    print(f"Imports do app.py: {best['import_ms']:.0f} ms (orçamento {import_budget_ms:.0f} ms)")
+    for name, ms in best['slowest_imports']:
+        print(f"    {ms:7.1f} ms  {name}")
+    print(f"Primeiro render: {best['render_ms']:.0f} ms (orçamento {render_budget_ms:.0f} ms)")
+
+    problems = [f"erro no primeiro render: {error}" for error in best['errors']]
+    if best['import_ms'] > import_budget_ms:
+        problems.append(f"imports acima do orçamento: {best['import_ms']:.0f} ms")
+    if best['render_ms'] > render_budget_ms:
+        problems.append(f"primeiro render acima do orçamento: {best['render_ms']:.0f} ms")
+    if best['loaded']:
+        problems.append(f"módulos pesados importados no arranque: {', '.join(best['loaded'])}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o cold start da aplicação contra um orçamento")
+    parser.add_argument('--runs', type=int, default=3, help="execuções medidas (conta a melhor)")
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--render-budget-ms', type=float, default=FIRST_RENDER_BUDGET_MS)
+    args = parser.parse_args()
+
+    problems = check_startup(args.runs, args.import_budget_ms, args.render_budget_ms)
+    for problem in problems:
+        print(f"FALHA: {problem}")
+    print("OK" if not problems else f"{len(problems)} problema(s) no arranque")
+    sys.exit(1 if problems else 0)
@@ -1,6 +1,21 @@
 """
 Configuração dos planos e texto do contrato
 """
+import hashlib
+import json
+import re
+import string
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Meses por extenso (independente do locale do servidor)
+MESES = (
+    'janeiro', 'fevereiro', 'marco', 'abril', 'maio', 'junho',
+    'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro'
+)
 
 # Configuração dos planos
 PLANOS = {
@@ -187,77 +202,222 @@ __________________________________
 Contratante (Assinatura Digital)
 """
 
+# ============================================
+# CATÁLOGO DE PLANOS
+# ============================================
+# Os planos à venda vivem na tabela plans do banco de dados (versionados);
+# PLANOS é a versão 1, usada para criar a tabela e quando não há banco
+PERIODO_TEXTO = {
+    'semestral': "PLANO SEMESTRAL (6 Meses de Fidelidade)",
+    'anual': "PLANO ANUAL (12 Meses de Fidelidade - Desconto Extra)",
+}
+REAGENDAMENTOS_TEXTO = "Plano Basic: Permitido 01 (um) reagendamento mensal.\nPlano Premium: Permitido ate 02 (dois) reagendamentos mensais."
+BENEFICIO_PREMIUM_TEXTO = "- Vantagem para o Premium: 1 Consultoria de skincare personalizada inclusa."
+PRECO_SESSAO_AVULSA = 60  # EUR, preço de referência da cláusula 2ª (quadro comparativo)
+
+# Colunas de cada versão de plano na tabela plans
+PLANO_CAMPOS = (
+    'nome_display', 'sessoes', 'valor_mensal', 'periodo', 'fidelidade',
+    'descricao', 'desconto_extras', 'reagendamentos', 'economia_anual', 'ativo'
+)
+
+class Plano(NamedTuple):
+    id: int                     # Linha na tabela plans (ordem de gravação)
+    nome: str
+    version: int
+    nome_display: str
+    sessoes: int
+    valor_mensal: int
+    periodo: str
+    fidelidade: int
+    descricao: str
+    desconto_extras: str
+    reagendamentos: int
+    economia_anual: int
+    ativo: bool
+    tipo: str                   # BASIC ou PREMIUM
+    # Textos do contrato, calculados uma vez
+    plano_escolhido: str
+    reagendamentos_info: str
+    beneficio_premium: str
+
+def normalizar_nome_plano(nome: str) -> str:
+    """'Prémium - ANUAL' -> 'premium anual' (sem acentos, maiúsculas nem pontuação)"""
+    sem_acentos = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', sem_acentos.lower()).split())
+
+def criar_plano(linha: dict) -> Plano:
+    """Cria o Plano (com os textos do contrato) a partir de uma linha da tabela plans"""
+    nome = linha['nome']
+    tipo = "PREMIUM" if "PREMIUM" in nome.upper() else "BASIC"
+    return Plano(
+        id=linha['id'],
+        nome=nome,
+        version=linha['version'],
+        nome_display=linha['nome_display'],
+        sessoes=linha['sessoes'],
+        valor_mensal=linha['valor_mensal'],
+        periodo=linha['periodo'],
+        fidelidade=linha['fidelidade'],
+        descricao=linha['descricao'],
+        desconto_extras=linha['desconto_extras'],
+        reagendamentos=linha['reagendamentos'],
+        economia_anual=linha.get('economia_anual') or 0,
+        ativo=bool(linha.get('ativo', True)),
+        tipo=tipo,
+        plano_escolhido=(
+            f"O(A) CONTRATANTE optou por:\n[X] {PERIODO_TEXTO[linha['periodo']]}\n"
+            f"    (X) {tipo}: {linha['valor_mensal']} EUR/mes"
+        ),
+        reagendamentos_info=REAGENDAMENTOS_TEXTO,
+        beneficio_premium=BENEFICIO_PREMIUM_TEXTO if tipo == "PREMIUM" else "",
+    )
+
+class CatalogoPlanos:
+    """
+    Todas as versões dos planos, com índice de aliases; imutável depois de criado
+    versao identifica o conteúdo (muda sempre que uma versão de plano é gravada)
+    """
+
+    def __init__(self, planos: Iterable[Plano], versao: int):
+        self.versao = versao
+        self._por_id = tuple(sorted(planos, key=lambda plano: plano.id))
+        self.versoes = MappingProxyType({(plano.nome, plano.version): plano for plano in self._por_id})
+
+        # Versão mais recente de cada plano (inclui os retirados de venda), pela ordem de criação
+        atuais = {}
+        for plano in self._por_id:
+            atuais[plano.nome] = plano
+        self.todos = MappingProxyType(atuais)
+        # Os planos semeados (versão 1 de PLANOS) são gravados juntos: existem todos desde o início
+        self._ultimo_semeado = max(
+            (plano.id for plano in self._por_id if plano.version == 1 and plano.nome in PLANOS), default=0
+        )
+        # Planos à venda, pela ordem em que foram criados
+        self.planos = MappingProxyType({nome: plano for nome, plano in atuais.items() if plano.ativo})
+
+        # Nomes alternativos (normalizados): nome do plano, nome de exibição e nomes antigos
+        # gravados em contratos (ex.: "Premium Anual")
+        self.aliases = MappingProxyType({
+            **{normalizar_nome_plano(plano.nome_display): plano for plano in atuais.values()},
+            **{normalizar_nome_plano(plano.nome): plano for plano in atuais.values()},
+        })
+
+    def encontrar(self, nome: str, versao: Optional[int] = None) -> Optional[Plano]:
+        """Plano pelo nome ou por um alias conhecido (na versão indicada); None se não existir"""
+        plano = self.todos.get(nome) or self.aliases.get(normalizar_nome_plano(nome or ''))
+        if plano is not None and versao is not None:
+            return self.versoes.get((plano.nome, versao), plano)
+        return plano
+
+    def resolver(self, nome: str, versao: Optional[int] = None) -> Plano:
+        """
+        Plano pelo nome ou alias; nomes desconhecidos (ex.: "Mensal") caem no plano
+        mais próximo pelo conteúdo, como sempre foi feito nos contratos antigos
+        """
+        plano = self.encontrar(nome, versao)
+        if plano is not None:
+            return plano
+        nome = (nome or '').upper()
+        tipo = "PREMIUM" if "PREMIUM" in nome else "BASIC"
+        periodo = "Semestral" if "SEMESTRAL" in nome else "Anual"
+        # Sem esse plano no catálogo, o primeiro plano criado
+        plano = self.todos.get(f"{tipo} - {periodo}") or self.todos[self._por_id[0].nome]
+        if versao is not None:
+            return self.versoes.get((plano.nome, versao), plano)
+        return plano
+
+    def tabela_comparativa(self, plano: Plano) -> List[List[str]]:
+        """
+        Linhas do quadro comparativo (plano, sessões, valor de mercado, valor no clube,
+        poupança) com os preços em vigor quando a versão `plano` foi gravada
+        """
+        # Última versão de cada plano até `plano`; planos criados depois ficam de fora
+        limite = max(plano.id, self._ultimo_semeado)
+        em_vigor = {}
+        for versao in self._por_id:
+            if versao.id <= limite:
+                em_vigor[versao.nome] = versao
+
+        # Por tipo, o plano de referência é o de mensalidade mais alta (sem desconto de fidelidade)
+        referencia = {}
+        for versao in em_vigor.values():
+            if versao.ativo and versao.valor_mensal >= getattr(referencia.get(versao.tipo), 'valor_mensal', 0):
+                referencia[versao.tipo] = versao
+
+        linhas = []
+        for tipo in sorted(referencia):
+            versao = referencia[tipo]
+            valor_mercado = versao.sessoes * PRECO_SESSAO_AVULSA
+            linhas.append([
+                tipo, f"{versao.sessoes} sessoes", f"{valor_mercado} EUR",
+                f"{versao.valor_mensal} EUR", f"{valor_mercado - versao.valor_mensal} EUR/mes"
+            ])
+        return linhas
+
+# Catálogo embutido (versão 1 dos planos), usado sem banco de dados
+CATALOGO_PADRAO = CatalogoPlanos(
+    [criar_plano({'id': i, 'nome': nome, 'version': 1, **info}) for i, (nome, info) in enumerate(PLANOS.items(), start=1)],
+    versao=len(PLANOS)
+)
+
+def resolver_plano(nome: str) -> Plano:
+    """Plano do catálogo embutido pelo nome ou alias (ver CatalogoPlanos.resolver)"""
+    return CATALOGO_PADRAO.resolver(nome)
+
+# Identifica os textos derivados dos planos; o texto do contrato (tabela
+# template_versions) e os dados dos planos (Plano.version) têm versões próprias,
+# gravadas em cada contrato
+TEMPLATE_VERSION = hashlib.sha256(
+    json.dumps(
+        [PERIODO_TEXTO, REAGENDAMENTOS_TEXTO, BENEFICIO_PREMIUM_TEXTO, PRECO_SESSAO_AVULSA],
+        sort_keys=True
+    ).encode('utf-8')
+).hexdigest()[:12]
+
+def hash_modelo(texto: str) -> str:
+    """SHA-256 do texto do modelo do contrato (identifica-o na tabela template_versions)"""
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
 def get_plano_info_texto(plano: str) -> str:
     """Retorna o texto formatado com as informações do plano escolhido"""
-    # Tentar encontrar o plano exato ou aproximado
-    if plano in PLANOS:
-        info = PLANOS[plano]
-    else:
-        # Busca case-insensitive
-        found = False
-        for p in PLANOS:
-            if p.lower() == plano.lower():
-                info = PLANOS[p]
-                found = True
-                break
-        
-        # Fallback para evitar erro se não achar
-        if not found:
-            # Tentar adivinhar pelo conteúdo da string
-            if "PREMIUM" in plano.upper():
-                if "SEMESTRAL" in plano.upper():
-                    info = PLANOS.get("PREMIUM - Semestral", {})
-                else:
-                    info = PLANOS.get("PREMIUM - Anual", {})
-            else:
-                if "SEMESTRAL" in plano.upper():
-                    info = PLANOS.get("BASIC - Semestral", {})
-                else:
-                    info = PLANOS.get("BASIC - Anual", {})
-    
-    # Valores padrão para evitar KeyError
-    valor_mensal = info.get('valor_mensal', '00')
-    
-    if "BASIC" in plano.upper():
-        tipo = "BASIC"
-    else:
-        tipo = "PREMIUM"
-    
-    if "Semestral" in plano or "SEMESTRAL" in plano.upper():
-        periodo = "PLANO SEMESTRAL (6 Meses de Fidelidade)"
-        return f"O(A) CONTRATANTE optou por:\n[X] {periodo}\n    (X) {tipo}: {valor_mensal} EUR/mes"
-    else:
-        periodo = "PLANO ANUAL (12 Meses de Fidelidade - Desconto Extra)"
-        return f"O(A) CONTRATANTE optou por:\n[X] {periodo}\n    (X) {tipo}: {valor_mensal} EUR/mes"
+    return resolver_plano(plano).plano_escolhido
 
 def get_reagendamentos_texto(plano: str) -> str:
     """Retorna o texto sobre reagendamentos baseado no plano"""
-    info = PLANOS.get(plano, {})
-    if "BASIC" in plano:
-        return "Plano Basic: Permitido 01 (um) reagendamento mensal.\nPlano Premium: Permitido ate 02 (dois) reagendamentos mensais."
-    else:
-        return "Plano Basic: Permitido 01 (um) reagendamento mensal.\nPlano Premium: Permitido ate 02 (dois) reagendamentos mensais."
+    return resolver_plano(plano).reagendamentos_info
 
 def get_beneficio_premium(plano: str) -> str:
     """Retorna texto do benefício premium se aplicável"""
-    if "PREMIUM" in plano:
-        return "- Vantagem para o Premium: 1 Consultoria de skincare personalizada inclusa."
-    return ""
-
-def get_contrato_completo(dados: dict) -> str:
-    """Gera o contrato completo com os dados do cliente"""
-    from datetime import datetime
-    
-    plano = dados.get('plano', '')
-    info_plano = PLANOS.get(plano, {})
+    return resolver_plano(plano).beneficio_premium
+
+def get_data_contrato(dados: dict) -> datetime:
+    """
+    Retorna a data do contrato a partir de created_at (texto do SQLite ou datetime)
+    Sem created_at (pré-visualização) usa o momento atual
+    """
+    created_at = dados.get('created_at')
+    if isinstance(created_at, datetime):
+        return created_at
+    if created_at:
+        try:
+            return datetime.fromisoformat(str(created_at))
+        except ValueError:
+            pass
+    return datetime.now()
+
+def formatar_data_extenso(data: datetime) -> str:
+    """Formata a data como '05 de marco de 2025'"""
+    return f"{data.day:02d} de {MESES[data.month - 1]} de {data.year}"
+
+def get_valores_contrato(dados: dict, plano: Optional[Plano] = None) -> Dict:
+    """
+    Valores dos campos do template para os dados do cliente
+    Sem plano, o plano é procurado pelo nome no catálogo embutido
+    """
+    plano = plano or resolver_plano(dados.get('plano', ''))
     
-    plano_escolhido = get_plano_info_texto(plano)
-    reagendamentos_info = get_reagendamentos_texto(plano)
-    desconto_extras = info_plano.get('desconto_extras', '30%')
-    beneficio_premium = get_beneficio_premium(plano)
-    fidelidade_meses = info_plano.get('fidelidade', 6)
-    
-    return CONTRATO_TEXTO.format(
+    return dict(
         nome=dados.get('nome', ''),
         nif=dados.get('nif', ''),
         email=dados.get('email', ''),
@@ -266,11 +426,103 @@ def get_contrato_completo(dados: dict) -> str:
         contratada_nome=dados.get('contratada_nome', 'MICAELA SAMPAIO'),
         contratada_nif=dados.get('contratada_nif', ''),
         contratada_endereco=dados.get('contratada_endereco', ''),
-        plano_escolhido=plano_escolhido,
-        reagendamentos_info=reagendamentos_info,
-        desconto_extras=desconto_extras,
-        beneficio_premium=beneficio_premium if beneficio_premium else "",
-        fidelidade_meses=fidelidade_meses,
-        data=datetime.now().strftime('%d de %B de %Y'),
+        plano_escolhido=plano.plano_escolhido,
+        reagendamentos_info=plano.reagendamentos_info,
+        desconto_extras=plano.desconto_extras,
+        beneficio_premium=plano.beneficio_premium,
+        fidelidade_meses=plano.fidelidade,
+        data=formatar_data_extenso(get_data_contrato(dados)),
         numero_contrato=dados.get('numero_contrato', '')
     )
+
+def get_contrato_completo(dados: dict, plano: Optional[Plano] = None, texto: str = CONTRATO_TEXTO) -> str:
+    """Gera o contrato completo com os dados do cliente (texto: modelo com que foi assinado)"""
+    return texto.format(**get_valores_contrato(dados, plano))
+
+# ============================================
+# MODELO ESTRUTURADO DO CONTRATO
+# ============================================
+# Tipos de bloco
+BLOCO_CLAUSULA = 'clausula'      # "CLAUSULA 1ª - DO OBJETO" (linhas: número e título)
+BLOCO_SUBTITULO = 'subtitulo'    # "2.1. Quadro..." ou linha curta em maiúsculas
+BLOCO_PARAGRAFO = 'paragrafo'
+BLOCO_TABELA = 'tabela'          # Cabeçalho de tabela ASCII ("| Plano | ... | Valor |")
+BLOCO_VAZIO = 'vazio'            # Linha em branco
+BLOCO_SEPARADOR = 'separador'    # Restantes linhas de tabela ASCII e separadores
+BLOCO_PARTES = 'partes'          # Qualificação das partes, de "CONTRATADA:" a "Doravante denominado" (filhos)
+BLOCO_CAMPO = 'campo'            # Linha com campos {…}, classificada depois de preenchida
+
+# Campos que mudam de contrato para contrato (os restantes dependem só do plano e das configurações)
+CAMPOS_CLIENTE = frozenset({'nome', 'nif', 'email', 'whatsapp', 'endereco', 'data', 'numero_contrato'})
+
+class Bloco(NamedTuple):
+    tipo: str
+    texto: str
+    linhas: Tuple[str, ...] = ()
+    filhos: Tuple['Bloco', ...] = ()
+    cliente: bool = False  # Texto com dados do cliente
+
+def classificar_linha(linha: str, cliente: bool = False) -> Bloco:
+    """Classifica uma linha (já sem campos por preencher) do texto do contrato"""
+    linha = linha.strip()
+    if not linha:
+        return Bloco(BLOCO_VAZIO, '', cliente=cliente)
+    if linha.count('|') >= 2 and "Plano" in linha and "Valor" in linha:
+        return Bloco(BLOCO_TABELA, linha, cliente=cliente)
+    if set(linha).issubset({'-', '|', ' ', '+'}) or linha.count('|') >= 2:
+        return Bloco(BLOCO_SEPARADOR, linha, cliente=cliente)
+    if 'CLAUSULA' in linha.upper():
+        return Bloco(BLOCO_CLAUSULA, linha, tuple(parte.strip() for parte in linha.split('-', 1)), cliente=cliente)
+    if ((linha[0].isdigit() and '.' in linha[:5]) or linha.isupper()) and len(linha) < 100:
+        return Bloco(BLOCO_SUBTITULO, linha, cliente=cliente)
+    return Bloco(BLOCO_PARAGRAFO, linha, cliente=cliente)
+
+def _compilar_linha(linha: str) -> Bloco:
+    campos = {campo for _, campo, _, _ in string.Formatter().parse(linha) if campo is not None}
+    if campos:
+        return Bloco(BLOCO_CAMPO, linha, cliente=not campos.isdisjoint(CAMPOS_CLIENTE))
+    return classificar_linha(linha)
+
+@lru_cache(maxsize=8)
+def get_modelo_contrato(texto: str = CONTRATO_TEXTO) -> Tuple[Bloco, ...]:
+    """
+    Compila o texto do modelo em blocos uma única vez por modelo
+    As linhas sem campos já ficam classificadas; as restantes são classificadas
+    depois de preenchidas (um campo pode expandir para várias linhas)
+    """
+    blocos = []
+    partes = None
+    for linha in texto.split('\n'):
+        if partes is None and linha.strip().startswith("CONTRATADA:"):
+            partes = [_compilar_linha(linha)]
+            continue
+        if partes is not None:
+            partes.append(_compilar_linha(linha))
+            if "Doravante denominado" in linha:
+                blocos.append(Bloco(BLOCO_PARTES, '', filhos=tuple(partes)))
+                partes = None
+            continue
+
+        blocos.append(_compilar_linha(linha))
+    if partes is not None:
+        # "CONTRATADA:" sem "Doravante denominado": não é um bloco de partes, mas o texto fica
+        blocos.extend(partes)
+    return tuple(blocos)
+
+def _preencher(blocos, valores: Dict) -> List[Bloco]:
+    preenchidos = []
+    for bloco in blocos:
+        if bloco.tipo == BLOCO_CAMPO:
+            preenchidos.extend(
+                classificar_linha(linha, bloco.cliente)
+                for linha in bloco.texto.format_map(valores).split('\n')
+            )
+        elif bloco.tipo == BLOCO_PARTES:
+            preenchidos.append(bloco._replace(filhos=tuple(_preencher(bloco.filhos, valores))))
+        else:
+            preenchidos.append(bloco)
+    return preenchidos
+
+def get_contrato_blocos(dados: dict, plano: Optional[Plano] = None, texto: str = CONTRATO_TEXTO) -> List[Bloco]:
+    """Blocos do contrato (modelo texto) com os campos preenchidos com os dados do cliente"""
+    return _preencher(get_modelo_contrato(texto), get_valores_contrato(dados, plano))
@@ -1,77 +1,515 @@
 """
 Gerenciamento do banco de dados SQLite
 """
+import os
+import re
+import time
+import queue
+import logging
+import hashlib
 import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Union
 import base64
 
+from contract_text import (
+    CONTRATO_TEXTO, PERIODO_TEXTO, PLANO_CAMPOS, PLANOS, CatalogoPlanos, criar_plano, hash_modelo
+)
+
+logger = logging.getLogger(__name__)
+
+# Ajustes aplicados a cada conexão do pool
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # Leitores não bloqueiam o escritor
+    "PRAGMA synchronous=NORMAL",      # Seguro com WAL, um fsync por checkpoint
+    "PRAGMA cache_size=-8192",        # ~8 MB de cache de páginas por conexão
+    "PRAGMA mmap_size=67108864",      # 64 MB de leitura via mmap
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 128  # Statements preparados reutilizados por conexão
+BUSY_TIMEOUT = 30.0
+
+
+def decode_signature(signature_data: Union[str, bytes]) -> Tuple[bytes, str]:
+    """
+    Converte a assinatura (data URL, base64 puro ou bytes) em (bytes, mime type).
+    Levanta ValueError se o base64 for inválido.
+    """
+    if isinstance(signature_data, (bytes, bytearray)):
+        return bytes(signature_data), 'image/png'
+
+    mime_type = 'image/png'
+    payload = signature_data
+    if ',' in signature_data:
+        header, payload = signature_data.split(',', 1)
+        if header.startswith('data:'):
+            mime_type = header[5:].split(';', 1)[0] or mime_type
+
+    return base64.b64decode(payload, validate=True), mime_type
+
+
 class Database:
-    def __init__(self, db_name: str = "contratos.db"):
+    def __init__(self, db_name: str = "contratos.db", pool_size: int = POOL_SIZE):
         self.db_name = db_name
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._reset_pool()
+        self.fts_enabled = False
+        self._settings_cache = None  # (versão, configurações)
+        self._plans_cache: Optional[CatalogoPlanos] = None
+        self._template_ids: Dict[str, int] = {}  # SHA-256 do modelo -> id (linhas imutáveis)
+        self._templates: Dict[int, str] = {}     # id -> texto do modelo
+        self._pdf_accesses: Dict[int, float] = {}  # id em pdf_cache -> último acesso ainda não gravado
+        self._pdf_access_lock = threading.Lock()
         self.init_database()
-    
-    def get_connection(self):
-        """Cria uma conexão com o banco de dados"""
-        return sqlite3.connect(self.db_name)
-    
+
+    def _reset_pool(self):
+        """(Re)cria o pool vazio - também usado após um fork"""
+        self._pool = queue.LifoQueue()
+        self._all_connections = []
+        self._thread_connections = []  # Conexões próprias de threads (open_thread_connection)
+        self._pool_pid = os.getpid()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Cria uma nova conexão configurada (usada pelo pool)"""
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=BUSY_TIMEOUT,
+            isolation_level=None,  # Transações controladas por transaction()
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._pool_lock:
+            if self._pool_pid != os.getpid():
+                # Conexões herdadas de outro processo não podem ser reutilizadas
+                self._reset_pool()
+            try:
+                return self._pool.get_nowait()
+            except queue.Empty:
+                pass
+            if len(self._all_connections) < self.pool_size:
+                conn = self.get_connection()
+                self._all_connections.append(conn)
+                return conn
+            pool = self._pool
+        return pool.get(timeout=BUSY_TIMEOUT)
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._pool_lock:
+            if conn in self._all_connections:
+                self._pool.put(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Empresta uma conexão do pool durante o bloco with.
+        Chamadas aninhadas na mesma thread reutilizam a mesma conexão.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def open_thread_connection(self) -> sqlite3.Connection:
+        """
+        Dá à thread atual uma conexão própria, fora do pool (ex.: a thread única de escrita)
+        connection() e transaction() nesta thread passam a usá-la, sem nunca esperar pelo pool.
+        Fica aberta até close_thread_connection() ou close().
+        """
+        if getattr(self._local, 'conn', None) is not None:
+            raise RuntimeError("esta thread já tem uma conexão em uso")
+        conn = self.get_connection()
+        with self._pool_lock:
+            self._thread_connections.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def close_thread_connection(self):
+        """Fecha a conexão aberta por open_thread_connection() na thread atual"""
+        conn = self._local.conn
+        self._local.conn = None
+        with self._pool_lock:
+            if conn in self._thread_connections:
+                self._thread_connections.remove(conn)
+        conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Executa o bloco numa transação (BEGIN IMMEDIATE ... COMMIT).
+        Faz rollback se ocorrer uma exceção; transações aninhadas juntam-se à externa.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        """Fecha todas as conexões do pool"""
+        if self._pdf_accesses:
+            try:
+                with self.transaction() as conn:
+                    self._flush_pdf_accesses(conn)
+            except sqlite3.Error:
+                pass  # Só afeta a ordem do LRU
+        with self._pool_lock:
+            connections = self._all_connections + self._thread_connections
+            self._reset_pool()
+        for conn in connections:
+            conn.close()
+
     def init_database(self):
         """Inicializa o banco de dados e cria a tabela se não existir"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS contracts (
+        with self.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS contracts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    contract_number TEXT UNIQUE NOT NULL,
+                    nome TEXT NOT NULL,
+                    nif TEXT NOT NULL,
+                    whatsapp TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    endereco TEXT NOT NULL,
+                    plano TEXT NOT NULL,
+                    signature_data TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Tabela de Configurações (Dados da Contratada)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+
+            # Inserir dados padrão se não existirem
+            default_settings = {
+                'contratada_nome': 'MICAELA SAMPAIO',
+                'contratada_nif': 'NIF_PENDENTE',
+                'contratada_endereco': 'ENDERECO_PENDENTE'
+            }
+
+            conn.executemany(
+                'INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)',
+                default_settings.items()
+            )
+
+            self._migrate(conn)
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'contracts_fts'"
+            ).fetchone() is not None
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Aplica as migrações pendentes, controladas por PRAGMA user_version"""
+        migrations = [
+            self._migrate_contract_sequences,
+            self._migrate_signature_blobs,
+            self._migrate_listing_index,
+            self._migrate_search_index,
+            self._migrate_secondary_indexes,
+            self._migrate_settings_version,
+            self._migrate_pdf_cache,
+            self._migrate_plans,
+            self._migrate_template_versions,
+        ]
+
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, migration in enumerate(migrations[version:], start=version + 1):
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {target}')
+
+    def _migrate_contract_sequences(self, conn: sqlite3.Connection):
+        """Cria a sequência anual de números de contrato a partir dos contratos existentes"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS contract_sequences (
+                year INTEGER PRIMARY KEY,
+                last_number INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            INSERT OR IGNORE INTO contract_sequences (year, last_number)
+            SELECT CAST(substr(contract_number, 5, 4) AS INTEGER),
+                   MAX(CAST(substr(contract_number, 10) AS INTEGER))
+            FROM contracts
+            WHERE contract_number LIKE 'CTR-____-%'
+            GROUP BY 1
+        ''')
+
+    def _migrate_signature_blobs(self, conn: sqlite3.Connection):
+        """Move as assinaturas base64 de contracts para a tabela signatures"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS signatures (
+                sha256 TEXT PRIMARY KEY,
+                mime_type TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        ''')
+        conn.execute('ALTER TABLE contracts ADD COLUMN signature_hash TEXT REFERENCES signatures(sha256)')
+
+        report = self.migrate_signatures()
+        if report['migrated']:
+            logger.info(
+                "Assinaturas migradas: %d (%d -> %d bytes, %d bytes poupados)",
+                report['migrated'], report['bytes_before'], report['bytes_after'], report['bytes_saved']
+            )
+
+    def _migrate_listing_index(self, conn: sqlite3.Connection):
+        """Índice usado pela listagem paginada (created_at, id)"""
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_contracts_created_at_id ON contracts (created_at, id)')
+
+    def _migrate_search_index(self, conn: sqlite3.Connection):
+        """
+        Índice FTS5 (sem acentos, sem distinção de maiúsculas, com prefixos)
+        sobre nome, NIF, email, WhatsApp e endereço, mantido por triggers
+        """
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS contracts_fts USING fts5(
+                    nome, nif, email, whatsapp, endereco,
+                    content='contracts',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            # SQLite sem FTS5: search_contracts continua a usar LIKE
+            logger.warning("Índice de busca FTS5 indisponível: %s", e)
+            return
+
+        columns = 'nome, nif, email, whatsapp, endereco'
+        old_values = "'delete', old.id, old.nome, old.nif, old.email, old.whatsapp, old.endereco"
+        new_values = 'new.id, new.nome, new.nif, new.email, new.whatsapp, new.endereco'
+        delete_old = f'INSERT INTO contracts_fts (contracts_fts, rowid, {columns}) VALUES ({old_values});'
+        insert_new = f'INSERT INTO contracts_fts (rowid, {columns}) VALUES ({new_values});'
+
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS contracts_fts_insert AFTER INSERT ON contracts
+            BEGIN {insert_new} END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS contracts_fts_delete AFTER DELETE ON contracts
+            BEGIN {delete_old} END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS contracts_fts_update AFTER UPDATE OF {columns} ON contracts
+            BEGIN {delete_old} {insert_new} END
+        ''')
+        conn.execute("INSERT INTO contracts_fts (contracts_fts) VALUES ('rebuild')")
+
+    def _migrate_secondary_indexes(self, conn: sqlite3.Connection):
+        """Índices para consultas por NIF e por plano"""
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_contracts_nif ON contracts (nif)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_contracts_plano ON contracts (plano, created_at)')
+
+    def _migrate_settings_version(self, conn: sqlite3.Connection):
+        """Contador de versão das configurações, incrementado por triggers em settings"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS settings_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 1)')
+
+        bump = 'UPDATE settings_version SET version = version + 1 WHERE id = 1;'
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS settings_version_{event.lower()} AFTER {event} ON settings
+                BEGIN {bump} END
+            ''')
+
+    def _migrate_pdf_cache(self, conn: sqlite3.Connection):
+        """Cache de PDFs gerados, com despejo LRU por tamanho total"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pdf_cache (
+                id INTEGER PRIMARY KEY,
+                cache_key TEXT UNIQUE NOT NULL,
+                contract_number TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                pdf BLOB NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_pdf_cache_lru ON pdf_cache (last_access, size)')
+
+    def _migrate_plans(self, conn: sqlite3.Connection):
+        """
+        Tabela plans (versões dos planos, só acrescentadas) com PLANOS como versão 1,
+        e a versão do plano em que cada contrato foi assinado
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS plans (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                contract_number TEXT UNIQUE NOT NULL,
                 nome TEXT NOT NULL,
-                nif TEXT NOT NULL,
-                whatsapp TEXT NOT NULL,
-                email TEXT NOT NULL,
-                endereco TEXT NOT NULL,
-                plano TEXT NOT NULL,
-                signature_data TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                version INTEGER NOT NULL,
+                nome_display TEXT NOT NULL,
+                sessoes INTEGER NOT NULL,
+                valor_mensal INTEGER NOT NULL,
+                periodo TEXT NOT NULL,
+                fidelidade INTEGER NOT NULL,
+                descricao TEXT NOT NULL,
+                desconto_extras TEXT NOT NULL,
+                reagendamentos INTEGER NOT NULL,
+                economia_anual INTEGER NOT NULL DEFAULT 0,
+                ativo INTEGER NOT NULL DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (nome, version)
             )
         ''')
+        conn.executemany(
+            f'''
+                INSERT OR IGNORE INTO plans (nome, version, {', '.join(PLANO_CAMPOS)})
+                VALUES (?, 1, {', '.join('?' * len(PLANO_CAMPOS))})
+            ''',
+            [
+                (nome, *({'economia_anual': 0, 'ativo': 1, **info}[campo] for campo in PLANO_CAMPOS))
+                for nome, info in PLANOS.items()
+            ]
+        )
 
-        # Tabela de Configurações (Dados da Contratada)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
+        # Contratos existentes foram todos assinados com a versão 1
+        conn.execute('ALTER TABLE contracts ADD COLUMN plan_version INTEGER')
+        conn.execute('UPDATE contracts SET plan_version = 1')
+
+    def _migrate_template_versions(self, conn: sqlite3.Connection):
+        """
+        Tabela template_versions (cada texto de modelo gravado uma vez, pelo SHA-256)
+        e o modelo com que cada contrato foi assinado
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS template_versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sha256 TEXT UNIQUE NOT NULL,
+                body TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        
-        # Inserir dados padrão se não existirem
-        default_settings = {
-            'contratada_nome': 'MICAELA SAMPAIO',
-            'contratada_nif': 'NIF_PENDENTE',
-            'contratada_endereco': 'ENDERECO_PENDENTE'
-        }
-        
-        for key, value in default_settings.items():
-            cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', (key, value))
-        
-        conn.commit()
-        conn.close()
-    
-    def generate_contract_number(self) -> str:
-        """Gera um número de contrato único no formato CTR-2024-XXXX"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        year = datetime.now().year
-        cursor.execute(
-            "SELECT COUNT(*) FROM contracts WHERE contract_number LIKE ?",
-            (f"CTR-{year}-%",)
+        conn.execute('ALTER TABLE contracts ADD COLUMN template_version_id INTEGER REFERENCES template_versions(id)')
+
+        # Contratos existentes: o modelo em uso (o único guardado até aqui)
+        conn.execute(
+            'UPDATE contracts SET template_version_id = ?',
+            (self._store_template(conn, CONTRATO_TEXTO),)
         )
-        count = cursor.fetchone()[0]
-        conn.close()
-        
-        next_number = count + 1
-        return f"CTR-{year}-{next_number:04d}"
-    
+
+    def _store_template(self, conn: sqlite3.Connection, body: str) -> int:
+        """
+        Grava o texto do modelo (deduplicado por SHA-256) e retorna o seu id
+        Os ids já confirmados ficam em memória: as linhas de template_versions nunca mudam
+        """
+        sha256 = hash_modelo(body)
+        template_id = self._template_ids.get(sha256)
+        if template_id is not None:
+            return template_id
+
+        row = conn.execute('SELECT id FROM template_versions WHERE sha256 = ?', (sha256,)).fetchone()
+        if row:
+            self._template_ids[sha256] = row[0]
+            return row[0]
+        # Só entra na memória depois de confirmado (a transação ainda pode ser revertida)
+        return conn.execute('INSERT INTO template_versions (sha256, body) VALUES (?, ?)', (sha256, body)).lastrowid
+
+    def _store_signature(self, conn: sqlite3.Connection, signature_data: Union[str, bytes, None]) -> Tuple[Optional[str], int]:
+        """
+        Grava a assinatura como BLOB (deduplicada por SHA-256)
+        Retorna o hash e o número de bytes efetivamente gravados (0 se já existia)
+        """
+        if not signature_data:
+            return None, 0
+
+        blob, mime_type = decode_signature(signature_data)
+        sha256 = hashlib.sha256(blob).hexdigest()
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO signatures (sha256, mime_type, data) VALUES (?, ?, ?)',
+            (sha256, mime_type, blob)
+        )
+        return sha256, len(blob) if cursor.rowcount == 1 else 0
+
+    def migrate_signatures(self) -> Dict:
+        """
+        Converte as assinaturas ainda guardadas em contracts.signature_data para BLOBs.
+        Retorna um relatório com o número de contratos migrados e os bytes poupados.
+        """
+        report = {'migrated': 0, 'skipped': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+        with self.transaction() as conn:
+            rows = conn.execute(
+                'SELECT id, signature_data FROM contracts WHERE signature_data IS NOT NULL'
+            ).fetchall()
+
+            for row in rows:
+                try:
+                    signature_hash, stored_bytes = self._store_signature(conn, row['signature_data'])
+                except ValueError:
+                    report['skipped'] += 1  # Base64 inválido: mantém o texto original
+                    continue
+
+                conn.execute(
+                    'UPDATE contracts SET signature_hash = ?, signature_data = NULL WHERE id = ?',
+                    (signature_hash, row['id'])
+                )
+                report['migrated'] += 1
+                report['bytes_before'] += len(row['signature_data'])
+                report['bytes_after'] += stored_bytes
+
+        report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+        return report
+
+    def _allocate_contract_numbers(self, conn: sqlite3.Connection, year: int, count: int) -> List[str]:
+        """Reserva um bloco contínuo de números de contrato para o ano (dentro de uma transação)"""
+        conn.execute('''
+            INSERT INTO contract_sequences (year, last_number) VALUES (?, ?)
+            ON CONFLICT(year) DO UPDATE SET last_number = last_number + excluded.last_number
+        ''', (year, count))
+        last_number = conn.execute(
+            'SELECT last_number FROM contract_sequences WHERE year = ?', (year,)
+        ).fetchone()[0]
+
+        return [f"CTR-{year}-{number:04d}" for number in range(last_number - count + 1, last_number + 1)]
+
+    def generate_contract_number(self, year: Optional[int] = None) -> str:
+        """
+        Reserva o próximo número de contrato no formato CTR-2024-XXXX.
+        Dentro de transaction() o número só fica reservado se a transação for confirmada.
+        """
+        with self.transaction() as conn:
+            return self._allocate_contract_numbers(conn, year or datetime.now().year, 1)[0]
+
     def create_contract(
         self,
         nome: str,
@@ -80,106 +518,367 @@ class Database:
         email: str,
         endereco: str,
         plano: str,
-        signature_data: Optional[str] = None
+        signature_data: Union[str, bytes, None] = None
     ) -> str:
         """
         Cria um novo contrato no banco de dados
+        A assinatura (data URL base64 ou bytes PNG) é guardada na tabela signatures
         Retorna o número do contrato gerado
         """
-        contract_number = self.generate_contract_number()
-        
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO contracts 
-            (contract_number, nome, nif, whatsapp, email, endereco, plano, signature_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (contract_number, nome, nif, whatsapp, email, endereco, plano, signature_data))
-        
-        conn.commit()
-        conn.close()
-        
+        with self.transaction() as conn:
+            # Número alocado na mesma transação do INSERT
+            contract_number = self.generate_contract_number()
+            signature_hash, _ = self._store_signature(conn, signature_data)
+            template_id = self._store_template(conn, CONTRATO_TEXTO)
+            conn.execute('''
+                INSERT INTO contracts
+                (contract_number, nome, nif, whatsapp, email, endereco, plano, signature_hash,
+                 plan_version, template_version_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT MAX(version) FROM plans WHERE nome = ?), ?)
+            ''', (contract_number, nome, nif, whatsapp, email, endereco, plano, signature_hash, plano, template_id))
+
         return contract_number
-    
+
+    def create_contracts(self, contracts: Iterable[Dict]) -> List[str]:
+        """
+        Cria vários contratos numa única transação (importação em massa)
+        Cada dict tem os campos de create_contract e, opcionalmente, created_at;
+        o ano do número do contrato segue created_at. Retorna os números gerados.
+        """
+        contracts = list(contracts)
+        years = [
+            int(contract['created_at'][:4]) if contract.get('created_at') else datetime.now().year
+            for contract in contracts
+        ]
+
+        with self.transaction() as conn:
+            numbers_by_year = {
+                year: iter(self._allocate_contract_numbers(conn, year, count))
+                for year, count in Counter(years).items()
+            }
+
+            template_id = self._store_template(conn, CONTRATO_TEXTO)
+            contract_numbers = []
+            contract_rows = []
+            for contract, year in zip(contracts, years):
+                contract_number = next(numbers_by_year[year])
+                contract_numbers.append(contract_number)
+                signature_hash, _ = self._store_signature(conn, contract.get('signature_data'))
+
+                contract_rows.append((
+                    contract_number, contract['nome'], contract['nif'], contract['whatsapp'],
+                    contract['email'], contract['endereco'], contract['plano'],
+                    signature_hash, contract['plano'], template_id, contract.get('created_at')
+                ))
+
+            conn.executemany('''
+                INSERT INTO contracts
+                (contract_number, nome, nif, whatsapp, email, endereco, plano, signature_hash,
+                 plan_version, template_version_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?,
+                        (SELECT MAX(version) FROM plans WHERE nome = ?), ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ''', contract_rows)
+
+        return contract_numbers
+
     def get_all_contracts(self) -> List[Dict]:
         """Retorna todos os contratos do banco de dados"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT id, contract_number, nome, nif, whatsapp, email,
+                       endereco, plano, created_at
+                FROM contracts
+                ORDER BY created_at DESC
+            ''')
+            return [dict(row) for row in cursor]
+
+    def get_contract_numbers_between(self, start: str, end: str) -> List[str]:
+        """Números dos contratos criados no intervalo [start, end) (datas 'AAAA-MM-DD')"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT contract_number FROM contracts
+                WHERE created_at >= ? AND created_at < ?
+                ORDER BY created_at, id
+            ''', (start, end))
+            return [row[0] for row in cursor]
+
+    def iter_contracts(self, include_signature: bool = False, batch_size: int = 500) -> Iterator[Dict]:
+        """
+        Percorre todos os contratos por ordem de id, buscando batch_size linhas de cada vez
+        Usa uma conexão própria para não ocupar o pool durante exportações longas
+        """
+        signature_column = ', s.data AS signature_data' if include_signature else ''
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, contract_number, nome, nif, whatsapp, email, 
-                   endereco, plano, created_at
-            FROM contracts
-            ORDER BY created_at DESC
-        ''')
-        
-        columns = [description[0] for description in cursor.description]
-        results = []
-        
-        for row in cursor.fetchall():
-            results.append(dict(zip(columns, row)))
-        
-        conn.close()
-        return results
-    
+        try:
+            cursor = conn.execute(f'''
+                SELECT c.id, c.contract_number, c.nome, c.nif, c.whatsapp, c.email,
+                       c.endereco, c.plano, c.created_at{signature_column}
+                FROM contracts c
+                LEFT JOIN signatures s ON s.sha256 = c.signature_hash
+                ORDER BY c.id
+            ''')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
     def search_contracts(self, name: str) -> List[Dict]:
-        """Busca contratos por nome do cliente"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, contract_number, nome, nif, whatsapp, email, 
-                   endereco, plano, created_at
-            FROM contracts
-            WHERE nome LIKE ?
-            ORDER BY created_at DESC
-        ''', (f"%{name}%",))
-        
-        columns = [description[0] for description in cursor.description]
-        results = []
-        
-        for row in cursor.fetchall():
-            results.append(dict(zip(columns, row)))
-        
-        conn.close()
-        return results
-    
-    def get_contract_by_number(self, contract_number: str) -> Optional[Dict]:
-        """Retorna um contrato específico pelo número"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, contract_number, nome, nif, whatsapp, email, 
-                   endereco, plano, signature_data, created_at
-            FROM contracts
-            WHERE contract_number = ?
-        ''', (contract_number,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            columns = ['id', 'contract_number', 'nome', 'nif', 'whatsapp', 
-                      'email', 'endereco', 'plano', 'signature_data', 'created_at']
-            return dict(zip(columns, row))
-        
-        return None
+        """
+        Busca contratos por nome, NIF, email, WhatsApp ou endereço
+        Ignora acentos e maiúsculas e aceita prefixos ("jo" encontra "João")
+        """
+        condition, params = self._search_condition(name)
+        with self.connection() as conn:
+            cursor = conn.execute(f'''
+                SELECT id, contract_number, nome, nif, whatsapp, email,
+                       endereco, plano, created_at
+                FROM contracts
+                WHERE {condition}
+                ORDER BY created_at DESC
+            ''', params)
+            return [dict(row) for row in cursor]
+
+    def _search_condition(self, search: str) -> Tuple[str, list]:
+        """Condição SQL (e parâmetros) para filtrar contratos pelo texto de busca"""
+        if not self.fts_enabled:
+            return 'nome LIKE ?', [f"%{search}%"]
+
+        # Cada palavra vira um prefixo entre aspas: "joao"* "silva"* (AND implícito)
+        terms = re.findall(r'\w+', search)
+        if not terms:
+            return '0', []
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return 'id IN (SELECT rowid FROM contracts_fts WHERE contracts_fts MATCH ?)', [match]
+
+    def get_contracts_page(
+        self,
+        page_size: int = 50,
+        cursor: Optional[Tuple[str, int]] = None,
+        search: Optional[str] = None
+    ) -> Dict:
+        """
+        Retorna uma página de contratos, dos mais recentes para os mais antigos.
+        Paginação por cursor (keyset) sobre (created_at, id): cursor é o next_cursor
+        da página anterior. Retorna {'items', 'next_cursor', 'total_estimate'}.
+        """
+        conditions = []
+        params = []
+        if search:
+            condition, search_params = self._search_condition(search)
+            conditions.append(condition)
+            params.extend(search_params)
+
+        count_where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        count_params = list(params)
+
+        if cursor:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(cursor)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT id, contract_number, nome, nif, whatsapp, email,
+                       endereco, plano, created_at
+                FROM contracts
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (*params, page_size + 1)).fetchall()
+
+            if search:
+                total_estimate = conn.execute(
+                    f'SELECT COUNT(*) FROM contracts {count_where}', count_params
+                ).fetchone()[0]
+            else:
+                # Sem filtro: último id atribuído, sem percorrer a tabela
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'contracts'").fetchone()
+                total_estimate = row[0] if row else 0
+
+        items = [dict(row) for row in rows[:page_size]]
+        next_cursor = None
+        if len(rows) > page_size:
+            next_cursor = (items[-1]['created_at'], items[-1]['id'])
+
+        return {'items': items, 'next_cursor': next_cursor, 'total_estimate': total_estimate}
+
+    def get_contract_by_number(self, contract_number: str, with_signature: bool = False) -> Optional[Dict]:
+        """
+        Retorna um contrato específico pelo número
+        A assinatura (bytes) só é carregada em signature_data se with_signature=True
+        """
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT id, contract_number, nome, nif, whatsapp, email,
+                       endereco, plano, plan_version, template_version_id, signature_hash, created_at
+                FROM contracts
+                WHERE contract_number = ?
+            ''', (contract_number,)).fetchone()
+
+            if not row:
+                return None
+
+            contract = dict(row)
+            if with_signature:
+                contract['signature_data'] = self.get_signature(contract['signature_hash'])
+
+        return contract
+
+    def get_signature(self, signature_hash: Optional[str]) -> Optional[bytes]:
+        """Retorna os bytes da imagem de assinatura pelo hash SHA-256"""
+        if not signature_hash:
+            return None
+
+        with self.connection() as conn:
+            row = conn.execute('SELECT data FROM signatures WHERE sha256 = ?', (signature_hash,)).fetchone()
+        return row[0] if row else None
+
+    def get_template(self, template_version_id: Optional[int]) -> str:
+        """
+        Retorna o texto do modelo com que o contrato foi assinado
+        Contratos sem modelo gravado usam o modelo atual (CONTRATO_TEXTO)
+        """
+        if template_version_id is None:
+            return CONTRATO_TEXTO
+
+        body = self._templates.get(template_version_id)
+        if body is None:
+            with self.connection() as conn:
+                row = conn.execute(
+                    'SELECT body FROM template_versions WHERE id = ?', (template_version_id,)
+                ).fetchone()
+            if not row:
+                raise KeyError(f"Modelo de contrato inexistente: {template_version_id}")
+            body = self._templates.setdefault(template_version_id, row['body'])
+        return body
+
+    def get_cached_pdf(self, cache_key: str) -> Optional[bytes]:
+        """
+        Retorna o PDF em cache para a chave, sem abrir uma transação de escrita
+        O acesso (para o LRU) fica em memória e é gravado com o próximo store_cached_pdf
+        """
+        with self.connection() as conn:
+            row = conn.execute('SELECT id, pdf FROM pdf_cache WHERE cache_key = ?', (cache_key,)).fetchone()
+        if not row:
+            return None
+        with self._pdf_access_lock:
+            self._pdf_accesses[row['id']] = time.time()
+        return row['pdf']
+
+    def _flush_pdf_accesses(self, conn: sqlite3.Connection):
+        """Grava os acessos ao cache de PDFs acumulados por get_cached_pdf (dentro de uma transação)"""
+        with self._pdf_access_lock:
+            accesses, self._pdf_accesses = self._pdf_accesses, {}
+        conn.executemany(
+            'UPDATE pdf_cache SET last_access = MAX(last_access, ?) WHERE id = ?',
+            [(accessed, pdf_id) for pdf_id, accessed in accesses.items()]
+        )
+
+    def store_cached_pdf(self, cache_key: str, contract_number: str, pdf: bytes, max_bytes: int):
+        """Guarda um PDF no cache e remove os menos usados até o total caber em max_bytes"""
+        with self.transaction() as conn:
+            # Acessos pendentes antes do despejo, para o LRU ver a ordem real
+            self._flush_pdf_accesses(conn)
+            conn.execute('''
+                INSERT OR REPLACE INTO pdf_cache (cache_key, contract_number, size, last_access, pdf)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (cache_key, contract_number, len(pdf), time.time(), pdf))
+            conn.execute('''
+                DELETE FROM pdf_cache WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, SUM(size) OVER (ORDER BY last_access DESC, id DESC) AS total
+                        FROM pdf_cache
+                    )
+                    WHERE total > ?
+                )
+            ''', (max_bytes,))
+
+    def get_settings_version(self) -> int:
+        """Retorna a versão atual das configurações (muda a cada alteração, em qualquer processo)"""
+        with self.connection() as conn:
+            return conn.execute('SELECT version FROM settings_version WHERE id = 1').fetchone()[0]
+
+    def get_settings(self) -> Dict[str, str]:
+        """
+        Retorna todas as configurações num dicionário
+        Mantidas em cache na memória e recarregadas quando a versão muda
+        """
+        with self.connection() as conn:
+            version = self.get_settings_version()
+            cached = self._settings_cache
+            if cached and cached[0] == version:
+                return dict(cached[1])
+
+            settings = {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM settings')}
+
+        self._settings_cache = (version, settings)
+        return dict(settings)
 
     def get_setting(self, key: str) -> str:
         """Retorna o valor de uma configuração"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else ""
+        return self.get_settings().get(key) or ""
 
     def set_setting(self, key: str, value: str):
         """Atualiza o valor de uma configuração"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, value))
-        conn.commit()
-        conn.close()
+        self.set_settings({key: value})
+
+    def set_settings(self, values: Dict[str, str]):
+        """Atualiza várias configurações numa única transação"""
+        with self.transaction() as conn:
+            conn.executemany('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', values.items())
+        self._settings_cache = None
+
+    def get_plans_version(self) -> int:
+        """Retorna a versão do catálogo de planos (id da última versão de plano gravada)"""
+        with self.connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM plans').fetchone()[0]
+
+    def get_plan_catalog(self) -> CatalogoPlanos:
+        """
+        Retorna o catálogo com todas as versões dos planos
+        Mantido em memória e recarregado quando a versão muda (em qualquer processo)
+        """
+        with self.connection() as conn:
+            version = self.get_plans_version()
+            cached = self._plans_cache
+            if cached is not None and cached.versao == version:
+                return cached
+
+            rows = conn.execute('SELECT * FROM plans WHERE id <= ? ORDER BY id', (version,)).fetchall()
+
+        catalogo = CatalogoPlanos([criar_plano(dict(row)) for row in rows], version)
+        self._plans_cache = catalogo
+        return catalogo
+
+    def save_plan(self, nome: str, values: Dict) -> int:
+        """
+        Grava uma nova versão do plano (as anteriores ficam para os contratos já assinados)
+        Campos omitidos em values mantêm o valor da versão atual; ativo=False retira o
+        plano de venda. Retorna o número da nova versão.
+        """
+        with self.transaction() as conn:
+            current = conn.execute(
+                'SELECT * FROM plans WHERE nome = ? ORDER BY version DESC LIMIT 1', (nome,)
+            ).fetchone()
+            row = {'economia_anual': 0, 'ativo': 1, **(dict(current) if current else {}), **values}
+
+            missing = [campo for campo in PLANO_CAMPOS if campo not in row]
+            if missing:
+                raise ValueError(f"Campos em falta para o plano {nome}: {', '.join(missing)}")
+            if row['periodo'] not in PERIODO_TEXTO:
+                raise ValueError(f"Período inválido: {row['periodo']}")
+
+            version = current['version'] + 1 if current else 1
+            conn.execute(
+                f'''
+                    INSERT INTO plans (nome, version, {', '.join(PLANO_CAMPOS)})
+                    VALUES (?, ?, {', '.join('?' * len(PLANO_CAMPOS))})
+                ''',
+                (nome, version, *(row[campo] for campo in PLANO_CAMPOS))
+            )
+        return version
@@ -0,0 +1,131 @@
+"""
+Exportação de contratos para CSV, JSONL ou Parquet em memória constante
+
+Os contratos são lidos em lotes (fetchmany) e escritos à medida que chegam,
+sem carregar a tabela inteira. Parquet requer o pacote opcional pyarrow.
+
+Uso: python exporter.py contratos.csv [--format csv|jsonl|parquet] [--db contratos.db] [--with-signatures]
+"""
+import argparse
+import base64
+import csv
+import io
+import json
+import sys
+from typing import BinaryIO, Dict, Iterator, List
+
+from database import Database
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORT_COLUMNS = ['id', 'contract_number', 'nome', 'nif', 'whatsapp', 'email', 'endereco', 'plano', 'created_at']
+BATCH_SIZE = 500
+
+
+def _batches(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text_signature(signature_data) -> str:
+    """Assinatura como data URL base64 (formatos de texto)"""
+    if not signature_data:
+        return ''
+    return "data:image/png;base64," + base64.b64encode(signature_data).decode()
+
+
+def _write_csv(rows: Iterator[Dict], out: BinaryIO, columns: List[str]):
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+    writer = csv.DictWriter(text, fieldnames=columns)
+    writer.writeheader()
+    for row in rows:
+        if 'signature_data' in columns:
+            row['signature_data'] = _text_signature(row['signature_data'])
+        writer.writerow(row)
+    text.flush()
+    text.detach()  # Não fechar o ficheiro do chamador
+
+
+def _write_jsonl(rows: Iterator[Dict], out: BinaryIO, columns: List[str]):
+    for row in rows:
+        if 'signature_data' in columns:
+            row['signature_data'] = _text_signature(row['signature_data'])
+        out.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+def _write_parquet(rows: Iterator[Dict], out: BinaryIO, columns: List[str]):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("A exportação Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+    fields = [pa.field('id', pa.int64())]
+    fields += [pa.field(column, pa.string()) for column in columns if column not in ('id', 'signature_data')]
+    if 'signature_data' in columns:
+        fields.append(pa.field('signature_data', pa.binary()))
+    schema = pa.schema(fields)
+
+    # Um row group por lote: só um lote fica em memória de cada vez
+    with pq.ParquetWriter(out, schema) as writer:
+        for batch in _batches(rows, BATCH_SIZE):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'jsonl': _write_jsonl,
+    'parquet': _write_parquet,
+}
+
+
+def export_contracts(db: Database, out: BinaryIO, fmt: str = 'csv', include_signature: bool = False) -> int:
+    """
+    Escreve todos os contratos em out (ficheiro binário) no formato indicado
+    Retorna o número de contratos exportados
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+
+    columns = EXPORT_COLUMNS + (['signature_data'] if include_signature else [])
+    count = 0
+
+    def counted_rows():
+        nonlocal count
+        for row in db.iter_contracts(include_signature=include_signature, batch_size=BATCH_SIZE):
+            count += 1
+            yield row
+
+    WRITERS[fmt](counted_rows(), out, columns)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta os contratos para CSV, JSONL ou Parquet")
+    parser.add_argument('path', help="ficheiro de destino")
+    parser.add_argument('--format', choices=sorted(WRITERS), help="formato (por omissão, pela extensão)")
+    parser.add_argument('--db', default='contratos.db', help="banco de dados SQLite")
+    parser.add_argument('--with-signatures', action='store_true', help="incluir as imagens das assinaturas")
+    args = parser.parse_args()
+
+    fmt = args.format or args.path.rsplit('.', 1)[-1].lower()
+    if fmt not in WRITERS:
+        parser.error(f"não foi possível deduzir o formato de {args.path}; use --format")
+
+    with open(args.path, 'wb') as out:
+        count = export_contracts(Database(args.db), out, fmt, args.with_signatures)
+    print(f"{count} contratos exportados para {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Gravação de contratos em group commit (modo write-behind opcional)
+
+GroupCommitWriter recebe os novos contratos numa fila limitada e grava-os
+numa única thread: junta os pedidos que chegam em rajada e confirma-os numa
+só transação (Database.create_contracts), com um único COMMIT - e um único
+fsync - por lote. Só há um escritor no processo, por isso as adesões em
+simultâneo deixam de disputar o lock de escrita do SQLite ("database is
+locked").
+
+O número do contrato é entregue por um Future. Um lote é confirmado quando
+atinge max_batch contratos ou quando passam max_delay segundos desde a
+chegada do primeiro; o atraso máximo de um pedido é max_delay mais o tempo do
+COMMIT (e do lote anterior, se ainda estiver a ser gravado). Com max_delay=0
+(padrão) o lote é o que chegou enquanto o COMMIT anterior corria: sem espera
+extra, e os lotes crescem sozinhos com a carga. Um max_delay maior troca
+latência por menos COMMITs, útil quando o fsync é caro (synchronous_full).
+
+Garantias de durabilidade:
+- O Future só recebe o número depois do COMMIT: um número entregue
+  corresponde sempre a um contrato gravado e visível para todas as conexões.
+- Com o padrão do pool (WAL, synchronous=NORMAL) um contrato confirmado
+  sobrevive à queda do processo, mas pode perder-se numa falha do sistema
+  operativo ou de energia antes do checkpoint seguinte. Com
+  synchronous_full=True o escritor usa synchronous=FULL: o WAL é sincronizado
+  em disco em cada COMMIT, uma vez por lote e não por contrato.
+- Os contratos ainda na fila ou no lote em curso perdem-se se o processo
+  morrer; nesse caso ninguém recebeu o número. close() grava tudo o que já
+  foi aceite antes de terminar. Se a thread do escritor terminar por um erro
+  inesperado, os pedidos pendentes recebem a exceção e submit() passa a
+  recusar novos pedidos.
+- create_contract() espera no máximo timeout segundos (WRITE_TIMEOUT). Se o
+  pedido ainda estiver na fila é cancelado e nunca é gravado; se o lote já
+  estiver a ser gravado, o contrato pode ficar gravado sem que o chamador
+  receba o número.
+- Se o lote falhar por causa de um contrato (ex.: campo obrigatório em falta),
+  cada contrato é gravado à parte e só os inválidos recebem a exceção. Erros
+  do banco (sqlite3.OperationalError, ex.: lock de outro processo para lá de
+  BUSY_TIMEOUT) são entregues a todos os Futures do lote.
+
+O escritor usa uma conexão própria (Database.open_thread_connection), fora
+do pool: não espera pelas leituras nem tira conexões aos leitores.
+
+O escritor é por processo: vários processos (uvicorn --workers, vários
+servidores Streamlit) continuam a serializar-se pelo lock do SQLite, mas uma
+vez por lote em vez de uma vez por contrato.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from typing import Dict, List, NamedTuple, Union
+
+from async_database import Overloaded
+from database import BUSY_TIMEOUT, Database, decode_signature
+
+MAX_BATCH = 64
+MAX_DELAY = 0.0           # Segundos que o primeiro contrato de um lote pode esperar por outros
+MAX_PENDING_WRITES = 1024
+WRITE_TIMEOUT = 2 * BUSY_TIMEOUT  # Espera máxima de create_contract (fila + lock de outro processo)
+
+
+class _Pedido(NamedTuple):
+    contract: Dict
+    future: Future
+    submitted: float  # time.monotonic() da chegada
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        db: Database,
+        max_batch: int = MAX_BATCH,
+        max_delay: float = MAX_DELAY,
+        max_pending: int = MAX_PENDING_WRITES,
+        synchronous_full: bool = False
+    ):
+        if max_batch < 1 or max_delay < 0:
+            raise ValueError("max_batch tem de ser positivo e max_delay não pode ser negativo")
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.synchronous_full = synchronous_full
+        self.commits = 0    # Transações confirmadas
+        self.committed = 0  # Contratos gravados
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._writer, name="db-group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        nome: str,
+        nif: str,
+        whatsapp: str,
+        email: str,
+        endereco: str,
+        plano: str,
+        signature_data: Union[str, bytes, None] = None
+    ) -> Future:
+        """
+        Agenda a gravação do contrato (mesmos campos de Database.create_contract)
+        Retorna um Future com o número do contrato, resolvido depois do COMMIT
+        Levanta ValueError se a assinatura for inválida e Overloaded se a fila estiver cheia
+        """
+        if signature_data:
+            decode_signature(signature_data)  # Erro já aqui, e não no lote dos outros
+
+        contract = {
+            'nome': nome, 'nif': nif, 'whatsapp': whatsapp, 'email': email,
+            'endereco': endereco, 'plano': plano, 'signature_data': signature_data,
+        }
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter já foi fechado ou o escritor terminou")
+            try:
+                self._queue.put_nowait(_Pedido(contract, future, time.monotonic()))
+            except queue.Full:
+                raise Overloaded()
+        return future
+
+    def create_contract(self, *args, timeout: float = WRITE_TIMEOUT, **kwargs) -> str:
+        """
+        Como Database.create_contract: espera pelo COMMIT e retorna o número do contrato
+        Levanta concurrent.futures.TimeoutError se passar timeout segundos
+        """
+        future = self.submit(*args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FuturesTimeoutError:
+            future.cancel()  # Só tem efeito se o pedido ainda não entrou num lote
+            raise
+
+    def close(self):
+        """Grava os contratos já aceites e termina a thread do escritor"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _writer(self):
+        batch = []
+        try:
+            # Conexão própria desta thread: create_contracts reutiliza-a
+            conn = self.db.open_thread_connection()
+            try:
+                if self.synchronous_full:
+                    conn.execute('PRAGMA synchronous=FULL')
+                closing = False
+                while not closing:
+                    batch, closing = self._next_batch()
+                    if batch:
+                        self._commit(batch)
+            finally:
+                self.db.close_thread_connection()
+        except BaseException as e:
+            self._abort(e, batch)
+            raise
+
+    def _abort(self, error: BaseException, batch: List[_Pedido]):
+        """O escritor terminou por um erro: recusa novos pedidos e falha o lote em curso e os pendentes"""
+        with self._lock:
+            self._closed = True
+        pendentes = list(batch)
+        while True:
+            try:
+                pedido = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pedido is not None:
+                pendentes.append(pedido)
+
+        failure = RuntimeError(f"o escritor em group commit terminou: {error!r}")
+        for pedido in pendentes:
+            future = pedido.future
+            if future.done():
+                continue
+            if future.running() or future.set_running_or_notify_cancel():
+                future.set_exception(failure)
+
+    def _next_batch(self):
+        """Espera pelo primeiro pedido e junta os seguintes até max_batch ou max_delay; retorna (lote, a fechar)"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = first.submitted + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit(self, batch: List[_Pedido]):
+        # Pedidos cancelados antes do COMMIT não são gravados
+        batch = [pedido for pedido in batch if pedido.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            numbers = self.db.create_contracts([pedido.contract for pedido in batch])
+        except Exception as e:
+            if len(batch) == 1 or isinstance(e, sqlite3.OperationalError):
+                for pedido in batch:
+                    pedido.future.set_exception(e)
+                return
+            # Um contrato inválido não pode derrubar os outros: grava um a um
+            for pedido in batch:
+                self._commit_one(pedido)
+            return
+
+        self.commits += 1
+        self.committed += len(batch)
+        for pedido, number in zip(batch, numbers):
+            pedido.future.set_result(number)
+
+    def _commit_one(self, pedido: _Pedido):
+        try:
+            number = self.db.create_contracts([pedido.contract])[0]
+        except Exception as e:
+            pedido.future.set_exception(e)
+            return
+        self.commits += 1
+        self.committed += 1
+        pedido.future.set_result(number)
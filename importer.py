@@ -0,0 +1,172 @@
+"""
+Importação em massa de contratos (CSV ou JSONL)
+
+Cada linha é validada, os números de contrato são reservados em bloco e os
+contratos são gravados com executemany em transações de chunk_size linhas.
+
+Uso: python importer.py contratos_legado.csv [--db contratos.db] [--chunk-size 500]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from contract_text import CATALOGO_PADRAO, CatalogoPlanos
+from database import Database, decode_signature
+
+REQUIRED_FIELDS = ['nome', 'nif', 'whatsapp', 'email', 'endereco', 'plano']
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y']
+
+
+def read_rows(path: str) -> Iterator[Tuple[int, Union[Dict, str]]]:
+    """
+    Lê o ficheiro linha a linha e retorna (número da linha, dados)
+    No JSONL os dados são o texto da linha, interpretado por parse_row
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, line
+        else:
+            # Linha 1 é o cabeçalho do CSV
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+
+
+def parse_row(row: Union[Dict, str]) -> Dict:
+    """
+    Dados de uma linha lida por read_rows (o texto de uma linha JSONL é descodificado)
+    Levanta ValueError se a linha não for um objeto JSON válido
+    """
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e.msg} (coluna {e.colno})")
+    if not isinstance(row, dict):
+        raise ValueError(f"a linha não é um objeto JSON: {type(row).__name__}")
+    return row
+
+
+def validate_row(row: Dict, catalogo: CatalogoPlanos = CATALOGO_PADRAO, a_venda: bool = False) -> Dict:
+    """
+    Valida e normaliza uma linha importada (o plano tem de existir no catálogo)
+    Com a_venda, o plano tem também de estar à venda (contratos novos); na
+    importação de contratos antigos os planos retirados continuam aceites
+    Levanta ValueError com a descrição do problema
+    """
+    contract = {}
+    for field in REQUIRED_FIELDS:
+        value = str(row.get(field) or '').strip()
+        if not value:
+            raise ValueError(f"campo obrigatório vazio: {field}")
+        contract[field] = value
+
+    plano = catalogo.encontrar(contract['plano'])
+    if not plano:
+        raise ValueError(f"plano desconhecido: {contract['plano']}")
+    if a_venda and plano.nome not in catalogo.planos:
+        raise ValueError(f"plano fora de venda: {plano.nome}")
+    contract['plano'] = plano.nome
+
+    created_at = str(row.get('created_at') or '').strip()
+    if created_at:
+        for date_format in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(created_at, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"data inválida: {created_at}")
+        contract['created_at'] = parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+    signature_data = row.get('signature_data')
+    if signature_data:
+        try:
+            decode_signature(signature_data)
+        except ValueError:
+            raise ValueError("assinatura em base64 inválida")
+        contract['signature_data'] = signature_data
+
+    return contract
+
+
+def import_contracts(
+    db: Database,
+    path: str,
+    chunk_size: int = 500,
+    progress: Optional[Callable[[int, int, float], None]] = None
+) -> Dict:
+    """
+    Importa os contratos do ficheiro em transações de chunk_size linhas
+    progress(importados, rejeitados, segundos) é chamado após cada chunk
+    Retorna {'imported', 'rejected': [(linha, erro)], 'seconds', 'rows_per_sec'}
+    """
+    imported = 0
+    rejected: List[Tuple[int, str]] = []
+    chunk = []
+    catalogo = db.get_plan_catalog()
+    started = time.perf_counter()
+
+    def flush():
+        nonlocal imported
+        if chunk:
+            imported += len(db.create_contracts(chunk))
+            chunk.clear()
+            if progress:
+                progress(imported, len(rejected), time.perf_counter() - started)
+
+    for line_number, row in read_rows(path):
+        try:
+            chunk.append(validate_row(parse_row(row), catalogo))
+        except ValueError as e:
+            rejected.append((line_number, str(e)))
+            continue
+
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    seconds = time.perf_counter() - started
+    return {
+        'imported': imported,
+        'rejected': rejected,
+        'seconds': seconds,
+        'rows_per_sec': imported / seconds if seconds > 0 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa contratos de um ficheiro CSV ou JSONL")
+    parser.add_argument('path', help="ficheiro .csv ou .jsonl")
+    parser.add_argument('--db', default='contratos.db', help="banco de dados SQLite")
+    parser.add_argument('--chunk-size', type=int, default=500, help="linhas por transação")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        parser.error(f"ficheiro não encontrado: {args.path}")
+
+    def show_progress(imported, rejected, seconds):
+        rate = imported / seconds if seconds > 0 else 0
+        print(f"\r{imported} importados, {rejected} rejeitados ({rate:.0f} linhas/s)", end='', flush=True)
+
+    report = import_contracts(Database(args.db), args.path, args.chunk_size, show_progress)
+    print()
+
+    for line_number, error in report['rejected']:
+        print(f"Linha {line_number}: {error}")
+    print(
+        f"{report['imported']} contratos importados em {report['seconds']:.2f}s "
+        f"({report['rows_per_sec']:.0f} linhas/s), {len(report['rejected'])} rejeitados"
+    )
+    return 1 if report['rejected'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
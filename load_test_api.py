@@ -0,0 +1,218 @@
+"""
+Teste de carga da API JSON (api.py) contra um servidor local
+
+Arranca o uvicorn numa cópia do banco, abre --concurrency ligações keep-alive
+e distribui os pedidos pelas rotas segundo --mix. Mostra pedidos/s e latências
+(p50/p95/p99) por rota. Termina com código 1 se algum pedido falhar (503 de
+servidor ocupado é contado à parte, não é falha).
+
+Uso: python load_test_api.py [--concurrency 32] [--requests 2000] [--workers 1]
+                             [--mix create=1,get=4,list=2,search=2,pdf=1] [--db contratos.db]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+API_TOKEN = 'teste-de-carga'
+DEFAULT_MIX = 'create=1,get=4,list=2,search=2,pdf=1'
+SEARCH_TERMS = ['ana', 'maria', 'silva', 'porto', 'gaia', 'rua']
+PLANS = ['BASIC - Semestral', 'BASIC - Anual', 'PREMIUM - Semestral', 'PREMIUM - Anual']
+
+
+class Connection:
+    """Cliente HTTP/1.1 mínimo com keep-alive (um pedido de cada vez)"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Authorization: Bearer {API_TOKEN}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n"
+        )
+        self.writer.write(head.encode('ascii') + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        close = False
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+            elif name.lower() == 'connection' and value.strip().lower() == 'close':
+                close = True
+        data = await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def parse_mix(mix: str) -> List[str]:
+    """'create=1,get=4' -> ['create', 'get', 'get', 'get', 'get']"""
+    operations = []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        operations += [name.strip()] * int(weight or 1)
+    return operations
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_load(port: int, concurrency: int, total: int, operations: List[str], numbers: List[str]) -> Dict:
+    """Executa total pedidos em concurrency ligações; retorna latências e estados por rota"""
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    remaining = total
+    rng = random.Random(42)
+
+    def next_request(operation: str) -> Tuple[str, str, Optional[dict]]:
+        if operation == 'create':
+            nome = f"Cliente Carga {rng.randrange(10 ** 6)}"
+            return 'POST', '/contracts', {
+                'nome': nome, 'nif': str(rng.randrange(10 ** 8, 10 ** 9)), 'whatsapp': '+351 910 000 000',
+                'email': 'carga@exemplo.pt', 'endereco': 'Rua da Carga, Porto', 'plano': rng.choice(PLANS)
+            }
+        if operation == 'get':
+            return 'GET', f"/contracts/{rng.choice(numbers)}", None
+        if operation == 'list':
+            return 'GET', '/contracts?limit=50', None
+        if operation == 'search':
+            return 'GET', f"/contracts?search={rng.choice(SEARCH_TERMS)}", None
+        if operation == 'pdf':
+            return 'GET', f"/contracts/{rng.choice(numbers)}/pdf", None
+        raise ValueError(f"operação desconhecida: {operation}")
+
+    async def client():
+        nonlocal remaining
+        connection = Connection(port)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                operation = rng.choice(operations)
+                method, path, body = next_request(operation)
+                started = time.perf_counter()
+                status, _ = await connection.request(method, path, body)
+                latencies[operation].append((time.perf_counter() - started) * 1000)
+                statuses[operation][status] += 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return {'seconds': time.perf_counter() - started, 'latencies': latencies, 'statuses': statuses}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = Connection(port)
+            status, _ = await connection.request('GET', '/settings')
+            connection.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("o servidor não arrancou a tempo")
+        await asyncio.sleep(0.2)
+
+
+async def prepare(port: int) -> List[str]:
+    """Espera pelo servidor e retorna números de contratos existentes (cria um se não houver)"""
+    await wait_until_ready(port)
+    connection = Connection(port)
+    _, data = await connection.request('GET', '/contracts?limit=200')
+    numbers = [item['contract_number'] for item in json.loads(data)['items']]
+    if not numbers:
+        _, data = await connection.request('POST', '/contracts', {
+            'nome': 'Cliente Inicial', 'nif': '123456789', 'whatsapp': '+351 910 000 000',
+            'email': 'inicial@exemplo.pt', 'endereco': 'Rua A, Porto', 'plano': PLANS[0]
+        })
+        numbers = [json.loads(data)['contract_number']]
+    connection.close()
+    return numbers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API JSON num servidor local")
+    parser.add_argument('--concurrency', type=int, default=32, help="ligações em simultâneo")
+    parser.add_argument('--requests', type=int, default=2000, help="total de pedidos")
+    parser.add_argument('--workers', type=int, default=1, help="processos do uvicorn")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="pesos das rotas (create, get, list, search, pdf)")
+    parser.add_argument('--db', default=os.path.join(APP_DIR, 'contratos.db'), help="banco copiado para o teste")
+    args = parser.parse_args()
+
+    operations = parse_mix(args.mix)
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'contratos.db')
+        if os.path.exists(args.db):
+            shutil.copy(args.db, db_path)
+
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'api:app', '--port', str(port),
+             '--workers', str(args.workers), '--log-level', 'warning'],
+            cwd=APP_DIR,
+            env={**os.environ, 'CONTRATOS_DB': db_path, 'CONTRATOS_API_TOKEN': API_TOKEN}
+        )
+        try:
+            numbers = asyncio.run(prepare(port))
+            result = asyncio.run(run_load(port, args.concurrency, args.requests, operations, numbers))
+        finally:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(values) for values in result['latencies'].values())
+    print(f"{total} pedidos em {result['seconds']:.2f} s: {total / result['seconds']:.0f} pedidos/s "
+          f"({args.concurrency} ligações, {args.workers} worker(s))")
+    print(f"{'rota':8} {'pedidos':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  estados")
+    failures = 0
+    for operation, values in sorted(result['latencies'].items()):
+        statuses = result['statuses'][operation]
+        failures += sum(count for status, count in statuses.items() if status >= 400 and status != 503)
+        print(
+            f"{operation:8} {len(values):8} {percentile(values, 0.50):8.1f} {percentile(values, 0.95):8.1f} "
+            f"{percentile(values, 0.99):8.1f}  {dict(sorted(statuses.items()))}"
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
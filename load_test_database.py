@@ -0,0 +1,132 @@
+"""
+Teste de carga do acesso assíncrono ao banco (async_database.AsyncDatabase)
+
+Corre --concurrency tarefas asyncio numa cópia do banco, com leituras
+(contrato por número, busca, configurações) e escritas (create_contract)
+na proporção de --write-ratio, e mede operações/s e o atraso máximo do event
+loop. Compara com as mesmas chamadas feitas diretamente ao Database síncrono
+dentro do event loop (que o bloqueiam).
+
+Uso: python load_test_database.py [--concurrency 64] [--operations 3000] [--write-ratio 0.1] [--db contratos.db]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from async_database import AsyncDatabase
+from database import Database
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SEARCH_TERMS = ['ana', 'maria', 'silva', 'porto', 'gaia', 'rua']
+LAG_INTERVAL = 0.005  # Período do medidor de atraso do event loop (s)
+
+
+class SyncOnLoop:
+    """As mesmas corrotinas de AsyncDatabase, mas chamando o Database diretamente (bloqueia o loop)"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def create_contract(self, *args):
+        return self.db.create_contract(*args)
+
+    async def get_contract_by_number(self, contract_number: str):
+        return self.db.get_contract_by_number(contract_number)
+
+    async def search_contracts(self, name: str):
+        return self.db.search_contracts(name)
+
+    async def get_settings(self):
+        return self.db.get_settings()
+
+    def close(self):
+        self.db.close()
+
+
+async def run_workload(db, concurrency: int, operations: int, write_ratio: float, numbers: List[str]) -> Dict:
+    """Executa as operações em concurrency tarefas; retorna contagens, duração e atraso do loop"""
+    rng = random.Random(42)
+    remaining = operations
+    counts = {'reads': 0, 'writes': 0}
+    max_lag = 0.0
+    running = True
+
+    async def lag_meter():
+        nonlocal max_lag
+        while running:
+            expected = time.perf_counter() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            max_lag = max(max_lag, time.perf_counter() - expected)
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if rng.random() < write_ratio:
+                await db.create_contract(
+                    f"Cliente Carga {rng.randrange(10 ** 6)}", str(rng.randrange(10 ** 8, 10 ** 9)),
+                    '+351 910 000 000', 'carga@exemplo.pt', 'Rua da Carga, Porto', 'BASIC - Anual'
+                )
+                counts['writes'] += 1
+            else:
+                choice = rng.random()
+                if choice < 0.6:
+                    await db.get_contract_by_number(rng.choice(numbers))
+                elif choice < 0.9:
+                    await db.search_contracts(rng.choice(SEARCH_TERMS))
+                else:
+                    await db.get_settings()
+                counts['reads'] += 1
+
+    meter = asyncio.create_task(lag_meter())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    running = False
+    await meter
+    return {**counts, 'seconds': seconds, 'max_lag_ms': max_lag * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga de AsyncDatabase")
+    parser.add_argument('--concurrency', type=int, default=64, help="tarefas em simultâneo")
+    parser.add_argument('--operations', type=int, default=3000, help="total de operações por cenário")
+    parser.add_argument('--write-ratio', type=float, default=0.1, help="fração de escritas (0 a 1)")
+    parser.add_argument('--db', default=os.path.join(APP_DIR, 'contratos.db'), help="banco copiado para o teste")
+    args = parser.parse_args()
+
+    print(f"{'cenário':14} {'ops/s':>8} {'leituras':>9} {'escritas':>9} {'atraso máx. loop':>17}")
+    for name, facade in (('sync no loop', SyncOnLoop), ('AsyncDatabase', AsyncDatabase)):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'contratos.db')
+            if os.path.exists(args.db):
+                shutil.copy(args.db, db_path)
+            sync_db = Database(db_path)
+            numbers = [contract['contract_number'] for contract in sync_db.get_all_contracts()]
+            if not numbers:
+                numbers = [sync_db.create_contract(
+                    'Cliente Inicial', '123456789', '+351 910 000 000', 'inicial@exemplo.pt', 'Rua A', 'BASIC - Anual'
+                )]
+
+            db = facade(sync_db)
+            try:
+                result = asyncio.run(run_workload(db, args.concurrency, args.operations, args.write_ratio, numbers))
+            finally:
+                db.close()
+
+        total = result['reads'] + result['writes']
+        print(
+            f"{name:14} {total / result['seconds']:8.0f} {result['reads']:9} {result['writes']:9} "
+            f"{result['max_lag_ms']:14.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
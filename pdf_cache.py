@@ -0,0 +1,88 @@
+"""
+Cache de PDFs de contratos gerados
+
+Os PDFs são determinísticos por contrato, versão das configurações, versão do
+plano, modelo do contrato e versão do layout, por isso podem ser reutilizados
+enquanto nenhum deles mudar. Ficam guardados na tabela pdf_cache, com despejo
+LRU quando o total passa de max_bytes.
+
+O pdf_generator (fpdf, PIL) só é importado quando um PDF tem de ser gerado:
+os hits do cache não pagam esse import.
+"""
+import threading
+from typing import Dict, Optional
+
+from contract_text import TEMPLATE_VERSION, Plano
+from database import Database
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Incrementar sempre que o layout do PDF (pdf_generator.py) mudar: invalida os PDFs em cache
+PDF_LAYOUT_VERSION = 2
+PDF_TEMPLATE_VERSION = f"{TEMPLATE_VERSION}.{PDF_LAYOUT_VERSION}"
+
+
+class PDFCache:
+    def __init__(self, db: Database, max_bytes: int = MAX_CACHE_BYTES):
+        self.db = db
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def cache_key(self, contract_number: str, settings_version: int, plano: Plano, template_version_id: Optional[int]) -> str:
+        return (
+            f"{contract_number}:{settings_version}:{plano.nome}@{plano.version}:"
+            f"t{template_version_id}:{PDF_TEMPLATE_VERSION}"
+        )
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_contract_pdf(self, contract_number: str) -> Optional[bytes]:
+        """
+        Retorna o PDF do contrato, gerando-o apenas se não estiver em cache
+        Retorna None se o contrato não existir
+        """
+        contract_data = self.db.get_contract_by_number(contract_number)
+        if not contract_data:
+            return None
+
+        # Versão do plano em que o contrato foi assinado
+        catalogo = self.db.get_plan_catalog()
+        plano = catalogo.resolver(contract_data['plano'], contract_data['plan_version'])
+
+        cache_key = self.cache_key(
+            contract_number, self.db.get_settings_version(), plano, contract_data['template_version_id']
+        )
+        pdf_bytes = self.db.get_cached_pdf(cache_key)
+        self._count(pdf_bytes is not None)
+        if pdf_bytes is not None:
+            return pdf_bytes
+
+        contract_data['signature_data'] = self.db.get_signature(contract_data['signature_hash'])
+        contract_data['numero_contrato'] = contract_data['contract_number']
+        contract_data.update(self.db.get_settings())
+
+        from pdf_generator import generate_contract_pdf
+
+        # Modelo com que o contrato foi assinado, mesmo que o atual já seja outro
+        texto = self.db.get_template(contract_data['template_version_id'])
+        pdf_bytes = generate_contract_pdf(contract_data, catalogo, texto)
+        if pdf_bytes:  # Não guardar falhas de geração
+            self.db.store_cached_pdf(cache_key, contract_number, pdf_bytes, self.max_bytes)
+        return pdf_bytes
+
+    def stats(self) -> Dict:
+        """Contadores de hits/misses deste processo"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
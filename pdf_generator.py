@@ -2,21 +2,59 @@
 Gerador de PDF para contratos - Versão Profissional e Estruturada
 """
 from fpdf import FPDF
-from datetime import datetime
+from collections import OrderedDict
+from datetime import timezone
 import base64
-from io import BytesIO
-from PIL import Image
-from contract_text import get_contrato_completo
+import copy
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+from contract_text import (
+    BLOCO_CLAUSULA, BLOCO_PARAGRAFO, BLOCO_PARTES, BLOCO_SEPARADOR, BLOCO_SUBTITULO, BLOCO_TABELA, BLOCO_VAZIO,
+    CATALOGO_PADRAO, CONTRATO_TEXTO, get_contrato_blocos, get_data_contrato
+)
 import os
 
 # Caminho para assets
 ASSETS_DIR = "assets"
 MICAELA_SIGNATURE_PATH = os.path.join(ASSETS_DIR, "assinatura_micaela.png")
 
+# Ao mudar o layout do PDF, incrementar pdf_cache.PDF_LAYOUT_VERSION (invalida os PDFs em cache)
+
+# Moldes em memória por (modelo, versão do plano, configurações): o texto já paginado, sem os dados do cliente
+MAX_MOLDES = 16
+_moldes = OrderedDict()
+_moldes_lock = threading.Lock()
+
+class CampoCliente(NamedTuple):
+    """Lugar reservado num molde para uma linha com dados do cliente"""
+    page: int
+    x: float
+    y: float
+    font_family: str
+    font_style: str
+    font_size: float
+    text_color: object
+    w: float
+    h: float
+    align: str
+
+@lru_cache(maxsize=1)
+def get_micaela_signature():
+    """Bytes da assinatura da Micaela, lidos do disco uma vez por processo"""
+    try:
+        with open(MICAELA_SIGNATURE_PATH, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
 class ContractPDF(FPDF):
     def __init__(self, orientation='P', unit='mm', format='A4', signature_data=None, company_data=None):
         super().__init__(orientation, unit, format)
-        self.signature_data = signature_data
+        # Assinatura decodificada uma única vez por documento (sem ficheiros temporários)
+        self.signature_image = get_signature_bytes(signature_data) if signature_data else None
+        # Num molde os textos do cliente não são desenhados, só se guarda o seu lugar
+        self.campos_cliente = None
         # Dados padrão caso não seja fornecido
         self.company_name = "MICAELA SAMPAIO"
         if company_data:
@@ -41,23 +79,18 @@ class ContractPDF(FPDF):
         self.set_y(-25) # Mais espaço para rubricas
         
         # --- RUBRICAS ---
-        # Rubrica Cliente (Esquerda)
-        if self.signature_data:
+        # Rubrica Cliente (Esquerda) - o fpdf reutiliza a imagem já carregada nas páginas seguintes
+        if self.signature_image:
             try:
-                sign_img = get_image_from_base64(self.signature_data)
-                if sign_img:
-                    # Salvar temp
-                    temp_rubrica = '/tmp/rubrica_cliente.png'
-                    sign_img.save(temp_rubrica, 'PNG')
-                    # Renderizar pequena rubrica
-                    self.image(temp_rubrica, x=20, y=self.get_y(), w=15)
+                self.image(self.signature_image, x=20, y=self.get_y(), w=15)
             except Exception as e:
                 pass # Ignorar erro de rubrica silenciosamente
 
         # Rubrica Micaela (Direita)
-        if os.path.exists(MICAELA_SIGNATURE_PATH):
+        micaela_signature = get_micaela_signature()
+        if micaela_signature:
             try:
-                self.image(MICAELA_SIGNATURE_PATH, x=175, y=self.get_y(), w=15)
+                self.image(micaela_signature, x=175, y=self.get_y(), w=15)
             except:
                 pass
 
@@ -66,179 +99,242 @@ class ContractPDF(FPDF):
         self.set_text_color(128, 128, 128)
         self.cell(0, 10, f'Pagina {self.page_no()}/{{nb}}', 0, 0, 'C')
 
-def get_image_from_base64(base64_string):
-    """Converte string base64 em objeto PIL Image"""
+    def campo_cliente(self, w, h, texto, align=''):
+        """Linha com dados do cliente (cell seguida de quebra de linha)"""
+        x = self.get_x()
+        if self.campos_cliente is None:
+            self.cell(w, h, texto, 0, 1, align)
+            return
+
+        self.cell(w, h, '', 0, 1, align)
+        # Lido depois da cell: se houve quebra de página, já é a posição na página nova
+        self.campos_cliente.append(CampoCliente(
+            self.page, x, self.get_y() - h, self.font_family, self.font_style,
+            self.font_size_pt, self.text_color, w, h, align
+        ))
+
+    def ir_para_pagina(self, page):
+        """Volta a uma página já desenhada (a fonte é definida de novo nessa página)"""
+        self.page = page
+        self.current_font_is_set_on_page = False
+
+    def preencher_campos(self, textos):
+        """
+        Desenha os textos do cliente nos lugares reservados pelo molde e a rubrica
+        do cliente nas páginas cujo footer já foi desenhado
+        """
+        page, x, y = self.page, self.get_x(), self.get_y()
+        font = (self.font_family, self.font_style, self.font_size_pt)
+        text_color = self.text_color
+
+        for campo, texto in zip(self.campos_cliente, textos):
+            self.ir_para_pagina(campo.page)
+            self.set_font(campo.font_family, campo.font_style, campo.font_size)
+            self.text_color = campo.text_color
+            self.set_xy(campo.x, campo.y)
+            self.cell(campo.w, campo.h, texto, 0, 0, campo.align)
+
+        if self.signature_image:
+            for footer_page in range(1, page):
+                self.ir_para_pagina(footer_page)
+                try:
+                    self.image(self.signature_image, x=20, y=self.h - 25, w=15) # Mesma posição do footer
+                except Exception:
+                    pass
+
+        self.ir_para_pagina(page)
+        self.set_font(*font)
+        self.text_color = text_color
+        self.set_xy(x, y)
+        self.campos_cliente = None
+
+def get_signature_bytes(signature_data):
+    """Converte a assinatura (bytes PNG ou string base64) nos bytes da imagem"""
     try:
-        if ',' in base64_string:
-            signature_bytes = base64.b64decode(base64_string.split(',')[1])
+        if isinstance(signature_data, (bytes, bytearray)):
+            return bytes(signature_data)
+        elif ',' in signature_data:
+            return base64.b64decode(signature_data.split(',')[1])
         else:
-            signature_bytes = base64.b64decode(base64_string)
-        return Image.open(BytesIO(signature_bytes))
+            return base64.b64decode(signature_data)
     except:
         return None
 
-def generate_contract_pdf(contract_data: dict) -> bytes:
+@lru_cache(maxsize=1)
+def _get_medidor():
+    """FPDF só para medir texto com a fonte dos parágrafos"""
+    medidor = FPDF()
+    medidor.set_font('Arial', '', 9)
+    return medidor
+
+def _novo_pdf(contract_data, signature_data=None):
+    # Extrair dados da empresa
+    company_data = {
+        'contratada_nome': contract_data.get('contratada_nome'),
+        'contratada_nif': contract_data.get('contratada_nif'),
+        'contratada_endereco': contract_data.get('contratada_endereco')
+    }
+    
+    pdf = ContractPDF('P', 'mm', 'A4', signature_data=signature_data, company_data=company_data)
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    pdf.set_margins(20, 20, 20)
+    pdf.set_auto_page_break(auto=True, margin=35) # Margem maior para footer caber rubricas
+    return pdf
+
+def _dados_box(contract_data):
+    """(rótulo, valor) das linhas da box de dados do cliente"""
+    nome = contract_data.get('nome', '').encode('latin-1', 'replace').decode('latin-1')
+    endereco = contract_data.get('endereco', '').encode('latin-1', 'replace').decode('latin-1')
+    return [
+        ('Nome:', nome),
+        ('NIF:', contract_data.get('nif', '')),
+        ('Email:', contract_data.get('email', '')),
+        ('WhatsApp:', contract_data.get('whatsapp', '')),
+        ('Endereco:', endereco[:60]), # Trunca endereço muito longo para caber na box
+    ]
+
+def _texto_pdf(bloco):
+    """Texto do bloco como é desenhado (latin-1; parágrafos limitados a 300 caracteres)"""
+    texto = bloco.texto.encode('latin-1', 'replace').decode('latin-1')
+    if bloco.tipo == BLOCO_PARAGRAFO:
+        return texto[:300] # Segurança extrema
+    return texto
+
+def _blocos_desenhados(blocos):
+    """Blocos que chegam ao PDF, pela ordem em que são desenhados"""
+    for bloco in blocos:
+        # Linhas vazias e separadores ASCII não são desenhados
+        if bloco.tipo in (BLOCO_VAZIO, BLOCO_SEPARADOR):
+            continue
+
+        # Qualificação das partes: com o nome padrão (MICAELA...) é omitida por inteiro,
+        # porque os dados do cliente já estão na box; caso contrário só sai a linha "Doravante"
+        if bloco.tipo == BLOCO_PARTES:
+            if "MICAELA" not in bloco.filhos[0].texto:
+                yield from _blocos_desenhados(bloco.filhos[:-1])
+            continue
+
+        yield bloco
+
+def _render_corpo(pdf, contract_data, blocos, tabela):
+    """Título, box de dados do cliente e texto do contrato"""
+    # Título do Documento
+    pdf.set_font('Arial', 'B', 14)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(0, 10, 'CONTRATO DE ADESAO', 0, 1, 'C')
+    
+    # Número do contrato
+    pdf.set_font('Arial', '', 10)
+    pdf.set_text_color(212, 175, 55)
+    pdf.campo_cliente(0, 6, f"N. {contract_data.get('numero_contrato', '')}", 'C')
+    pdf.ln(10)
+    
+    # --- BOX DE DADOS DO CLIENTE ---
+    pdf.set_fill_color(250, 250, 250)
+    pdf.set_draw_color(230, 230, 230)
+    pdf.rect(20, pdf.get_y(), 170, 45, 'DF')
+    
+    pdf.set_xy(25, pdf.get_y() + 5)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(0, 6, 'DADOS DO(A) CONTRATANTE', 0, 1, 'L')
+    
+    pdf.set_font('Arial', '', 9)
+    for rotulo, valor in _dados_box(contract_data):
+        pdf.set_x(25)
+        pdf.cell(20, 6, rotulo, 0, 0)
+        pdf.campo_cliente(0, 6, valor)
+    
+    pdf.set_y(pdf.get_y() + 10) # Sair da box
+    
+    # Texto do contrato (modelo compilado uma vez por versão do template)
+    render_blocos(pdf, blocos, tabela)
+
+def _chave_molde(contract_data, texto, plano, tabela, blocos):
+    """
+    Chave do molde do contrato: modelo, versão do plano, quadro comparativo,
+    configurações e forma das linhas do cliente
+    Retorna None se alguma linha do cliente mudar a paginação (ex.: parágrafo com quebra)
+    """
+    medidor = _get_medidor()
+    largura = 170 - 2 * medidor.c_margin - 1 # 1 mm de folga face à quebra do multi_cell
+    formas = []
+    for bloco in _blocos_desenhados(blocos):
+        if not bloco.cliente:
+            continue
+        if bloco.tipo == BLOCO_SUBTITULO:
+            formas.append(bloco.tipo)
+        elif bloco.tipo == BLOCO_PARAGRAFO and medidor.get_string_width(_texto_pdf(bloco)) < largura:
+            formas.append(bloco.tipo)
+        else:
+            return None
+    return (
+        texto,
+        plano,
+        tuple(map(tuple, tabela)),
+        contract_data.get('contratada_nome'),
+        contract_data.get('contratada_nif'),
+        contract_data.get('contratada_endereco'),
+        tuple(formas)
+    )
+
+def _get_molde(chave, contract_data, blocos, tabela):
+    """PDF com tudo o que não depende do cliente, gerado uma vez por chave (LRU)"""
+    with _moldes_lock:
+        molde = _moldes.get(chave)
+        if molde is not None:
+            _moldes.move_to_end(chave)
+            return molde
+
+    molde = _novo_pdf(contract_data)
+    molde.campos_cliente = []
+    _render_corpo(molde, contract_data, blocos, tabela)
+
+    with _moldes_lock:
+        _moldes[chave] = molde
+        if len(_moldes) > MAX_MOLDES:
+            _moldes.popitem(last=False)
+    return molde
+
+def generate_contract_pdf(contract_data: dict, catalogo=CATALOGO_PADRAO, texto: str = CONTRATO_TEXTO) -> bytes:
     """
     Gera um PDF do contrato profissional e estruturado
     
+    O texto do plano e das configurações vem de um molde em cache; só os
+    dados do cliente, as rubricas e as assinaturas são desenhados por contrato.
+    
     Args:
         contract_data: Dicionário com os dados do contrato
+        catalogo: Catálogo de planos (contract_text.CatalogoPlanos); o plano é
+            usado na versão contract_data['plan_version'], se existir
+        texto: Modelo do contrato com que foi assinado (tabela template_versions)
         
     Returns:
         bytes: PDF em formato bytes
     """
     try:
-        # Criar PDF
         signature_data = contract_data.get('signature_data')
+        plano = catalogo.resolver(contract_data.get('plano', ''), contract_data.get('plan_version'))
+        tabela = catalogo.tabela_comparativa(plano)
+        blocos = get_contrato_blocos(contract_data, plano, texto)
+        chave = _chave_molde(contract_data, texto, plano, tabela, blocos)
         
-        # Extrair dados da empresa
-        company_data = {
-            'contratada_nome': contract_data.get('contratada_nome'),
-            'contratada_nif': contract_data.get('contratada_nif'),
-            'contratada_endereco': contract_data.get('contratada_endereco')
-        }
-        
-        pdf = ContractPDF('P', 'mm', 'A4', signature_data=signature_data, company_data=company_data)
-        pdf.alias_nb_pages()
-        pdf.add_page()
-        pdf.set_margins(20, 20, 20)
-        pdf.set_auto_page_break(auto=True, margin=35) # Margem maior para footer caber rubricas
-        
-        # Título do Documento
-        pdf.set_font('Arial', 'B', 14)
-        pdf.set_text_color(0, 0, 0)
-        pdf.cell(0, 10, 'CONTRATO DE ADESAO', 0, 1, 'C')
-        
-        # Número do contrato
-        pdf.set_font('Arial', '', 10)
-        pdf.set_text_color(212, 175, 55)
-        pdf.cell(0, 6, f"N. {contract_data.get('numero_contrato', '')}", 0, 1, 'C')
-        pdf.ln(10)
-        
-        # --- BOX DE DADOS DO CLIENTE ---
-        pdf.set_fill_color(250, 250, 250)
-        pdf.set_draw_color(230, 230, 230)
-        pdf.rect(20, pdf.get_y(), 170, 45, 'DF')
-        
-        pdf.set_xy(25, pdf.get_y() + 5)
-        pdf.set_font('Arial', 'B', 10)
-        pdf.set_text_color(0, 0, 0)
-        pdf.cell(0, 6, 'DADOS DO(A) CONTRATANTE', 0, 1, 'L')
-        
-        pdf.set_font('Arial', '', 9)
-        pdf.set_x(25)
-        nome = contract_data.get('nome', '').encode('latin-1', 'replace').decode('latin-1')
-        pdf.cell(20, 6, 'Nome:', 0, 0)
-        pdf.cell(0, 6, nome, 0, 1)
-        
-        pdf.set_x(25)
-        nif = contract_data.get('nif', '')
-        pdf.cell(20, 6, 'NIF:', 0, 0)
-        pdf.cell(0, 6, nif, 0, 1)
-        
-        pdf.set_x(25)
-        email = contract_data.get('email', '')
-        pdf.cell(20, 6, 'Email:', 0, 0)
-        pdf.cell(0, 6, email, 0, 1)
-        
-        pdf.set_x(25)
-        whatsapp = contract_data.get('whatsapp', '')
-        pdf.cell(20, 6, 'WhatsApp:', 0, 0)
-        pdf.cell(0, 6, whatsapp, 0, 1)
-        
-        pdf.set_x(25)
-        endereco = contract_data.get('endereco', '').encode('latin-1', 'replace').decode('latin-1')
-        pdf.cell(20, 6, 'Endereco:', 0, 0)
-        pdf.cell(0, 6, endereco[:60], 0, 1) # Trunca endereço muito longo para caber na box
-        
-        pdf.set_y(pdf.get_y() + 10) # Sair da box
-        
-        # Texto do contrato
-        texto_contrato = get_contrato_completo(contract_data)
-        
-        # Processar o texto com inteligência
-        linhas = texto_contrato.split('\n')
-        ignore_next_lines = False # Flag para pular seções que renderizamos manualmente (como dados do cliente)
+        if chave is None:
+            # Sem molde compatível: gerar o documento inteiro
+            pdf = _novo_pdf(contract_data, signature_data)
+            _render_corpo(pdf, contract_data, blocos, tabela)
+        else:
+            # O molde nunca é alterado: cada contrato desenha sobre uma cópia
+            pdf = copy.deepcopy(_get_molde(chave, contract_data, blocos, tabela))
+            pdf.signature_image = get_signature_bytes(signature_data) if signature_data else None
+            textos = [f"N. {contract_data.get('numero_contrato', '')}"]
+            textos += [valor for _, valor in _dados_box(contract_data)]
+            textos += [_texto_pdf(bloco) for bloco in _blocos_desenhados(blocos) if bloco.cliente]
+            pdf.preencher_campos(textos)
         
-        for linha in linhas:
-            linha_raw = linha
-            linha = linha.strip()
-            
-            # Pular cabeçalho ASCII antigo se ainda estiver no texto
-            if "CONTRATADA:" in linha and "MICAELA" in linha:
-                ignore_next_lines = True
-                continue
-            if "Doravante denominado" in linha:
-                ignore_next_lines = False
-                continue
-            if ignore_next_lines:
-                continue
-                
-            # Pular linhas de tabela ASCII e separadores
-            if set(linha).issubset({'-', '|', ' ', '+'}):
-                continue
-            if linha.count('|') >= 2 and "Plano" in linha and "Valor" in linha: # Cabeçalho da tabela
-                # Renderizar Tabela Real
-                render_comparison_table(pdf)
-                continue
-            if linha.count('|') >= 2: # Linhas da tabela
-                continue
-                
-            # Renderizar Títulos e Cláusulas
-            if 'CLAUSULA' in linha.upper():
-                pdf.ln(5)
-                pdf.set_font('Arial', 'B', 10)
-                pdf.set_text_color(0, 0, 0)
-                # Formatar Clausula X - TITULO
-                parts = linha.split('-', 1)
-                if len(parts) == 2:
-                    pdf.cell(0, 6, parts[0].strip(), 0, 1, 'L')
-                    pdf.cell(0, 6, parts[1].strip(), 0, 1, 'L')
-                else:
-                     pdf.cell(0, 6, linha, 0, 1, 'L')
-                pdf.set_font('Arial', '', 9)
-                pdf.ln(2)
-                continue
-            
-            # Subtítulos (ex: 2.1. Quadro...)
-            if linha and (linha[0].isdigit() and '.' in linha[:5]) or linha.isupper():
-                if len(linha) < 100: # Evitar confundir texto longo em caps lock
-                   pdf.ln(2)
-                   pdf.set_font('Arial', 'B', 9)
-                   try:
-                       pdf.cell(0, 5, linha.encode('latin-1', 'replace').decode('latin-1'), 0, 1)
-                   except:
-                       pdf.cell(0, 5, linha.encode('ascii', 'replace').decode('ascii'), 0, 1)
-                   pdf.set_font('Arial', '', 9)
-                   continue
-
-            # Texto normal
-            if not linha:
-                pdf.ln(2)
-                continue
-                
-            # Tratamento de encoding e width
-            try:
-                safe_text = linha.encode('latin-1', 'replace').decode('latin-1')
-            except:
-                safe_text = linha.encode('ascii', 'replace').decode('ascii')
-                
-            if len(safe_text) > 300: # Segurança extrema
-                safe_text = safe_text[:300]
-            
-            # Garantir que estamos na margem esquerda para ter largura total
-            pdf.set_x(20)
-            try:
-                pdf.multi_cell(0, 5, safe_text)
-            except Exception as e:
-                # Fallback: tentar reduzir fonte ou apenas truncar
-                print(f"Erro linha PDF: {e}")
-                try:
-                    pdf.set_font('Arial', '', 8)
-                    pdf.multi_cell(0, 5, safe_text)
-                    pdf.set_font('Arial', '', 9)
-                except:
-                    pass
+        # Metadados fixos pela data do contrato: mesmo contrato => mesmos bytes
+        pdf.set_creation_date(get_data_contrato(contract_data).replace(tzinfo=timezone.utc))
         
         # Assinaturas (sempre numa nova página se estiver no fim)
         if pdf.get_y() > 220:
@@ -256,7 +352,61 @@ def generate_contract_pdf(contract_data: dict) -> bytes:
         traceback.print_exc()
         return b''
 
-def render_comparison_table(pdf):
+def render_blocos(pdf, blocos, tabela):
+    """
+    Renderiza os blocos do modelo do contrato (contract_text.get_contrato_blocos)
+    tabela: linhas do quadro comparativo (CatalogoPlanos.tabela_comparativa)
+    """
+    for bloco in _blocos_desenhados(blocos):
+        if bloco.tipo == BLOCO_TABELA:
+            render_comparison_table(pdf, tabela)
+            continue
+
+        # Renderizar Títulos e Cláusulas
+        if bloco.tipo == BLOCO_CLAUSULA:
+            pdf.ln(5)
+            pdf.set_font('Arial', 'B', 10)
+            pdf.set_text_color(0, 0, 0)
+            # Formatar Clausula X - TITULO
+            for parte in bloco.linhas:
+                pdf.cell(0, 6, parte, 0, 1, 'L')
+            pdf.set_font('Arial', '', 9)
+            pdf.ln(2)
+            continue
+        
+        # Subtítulos (ex: 2.1. Quadro...)
+        if bloco.tipo == BLOCO_SUBTITULO:
+            pdf.ln(2)
+            pdf.set_font('Arial', 'B', 9)
+            if bloco.cliente:
+                pdf.campo_cliente(0, 5, _texto_pdf(bloco))
+            else:
+                pdf.cell(0, 5, _texto_pdf(bloco), 0, 1)
+            pdf.set_font('Arial', '', 9)
+            continue
+
+        # Texto normal - tratamento de encoding e width
+        safe_text = _texto_pdf(bloco)
+        
+        # Garantir que estamos na margem esquerda para ter largura total
+        pdf.set_x(20)
+        if bloco.cliente and pdf.campos_cliente is not None:
+            # Num molde o parágrafo do cliente cabe numa linha (ver _chave_molde)
+            pdf.campo_cliente(0, 5, safe_text)
+            continue
+        try:
+            pdf.multi_cell(0, 5, safe_text)
+        except Exception as e:
+            # Fallback: tentar reduzir fonte ou apenas truncar
+            print(f"Erro linha PDF: {e}")
+            try:
+                pdf.set_font('Arial', '', 8)
+                pdf.multi_cell(0, 5, safe_text)
+                pdf.set_font('Arial', '', 9)
+            except:
+                pass
+
+def render_comparison_table(pdf, rows):
     """Renderiza a tabela comparativa de preços"""
     pdf.ln(5)
     
@@ -272,12 +422,7 @@ def render_comparison_table(pdf):
         pdf.cell(col_widths[i], 8, h, 1, 0, 'C', True)
     pdf.ln()
     
-    # Dados
-    rows = [
-        ['BASIC', '2 sessoes', '120 EUR', '75 EUR', '45 EUR/mes'],
-        ['PREMIUM', '4 sessoes', '240 EUR', '120 EUR', '120 EUR/mes']
-    ]
-    
+    # Dados (preços do catálogo de planos)
     pdf.set_font('Arial', '', 8)
     for row in rows:
         for i, data in enumerate(row):
@@ -299,25 +444,21 @@ def render_signatures(pdf, contract_data):
     pdf.cell(0, 10, 'ASSINATURAS', 0, 1, 'C')
     pdf.ln(5)
     
-    # Assinatura Cliente (Esquerda)
-    signature_data = contract_data.get('signature_data')
-    if signature_data:
+    # Assinatura Cliente (Esquerda) - mesma imagem já decodificada para as rubricas
+    if pdf.signature_image:
         try:
-            sign_img = get_image_from_base64(signature_data)
-            temp_path = '/tmp/signature.png'
-            sign_img.save(temp_path, 'PNG')
-            
             # Centralizar imagem na esquerda
-            pdf.image(temp_path, x=45, y=pdf.get_y(), w=40)
+            pdf.image(pdf.signature_image, x=45, y=pdf.get_y(), w=40)
         except Exception as e:
             print(f"Erro assinatura cliente: {e}")
             
     # Assinatura Micaela (Direita) - Fixa
-    if os.path.exists(MICAELA_SIGNATURE_PATH):
+    micaela_signature = get_micaela_signature()
+    if micaela_signature:
         try:
              # Ajustar posição Y para alinhar com a do cliente
              y_pos_micaela = pdf.get_y() 
-             pdf.image(MICAELA_SIGNATURE_PATH, x=135, y=y_pos_micaela, w=40)
+             pdf.image(micaela_signature, x=135, y=y_pos_micaela, w=40)
         except Exception as e:
             print(f"Erro assinatura micaela: {e}")
             
@@ -338,6 +479,6 @@ def render_signatures(pdf, contract_data):
     pdf.cell(75, 5, 'Micaela Sampaio - Clube Estetica', 0, 1, 'C')
     
     pdf.ln(5)
-    date_str = datetime.now().strftime('%d/%m/%Y %H:%M')
+    date_str = get_data_contrato(contract_data).strftime('%d/%m/%Y %H:%M')
     pdf.set_text_color(150, 150, 150)
     pdf.cell(0, 5, f'Assinado digitalmente em: {date_str}', 0, 1, 'C')
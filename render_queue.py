@@ -0,0 +1,84 @@
+"""
+Fila local de geração de PDFs em segundo plano
+
+O PDF começa a ser gerado assim que o contrato é gravado, num pequeno número de
+threads, e o resultado fica no cache de PDFs. A fila tem capacidade limitada:
+quando está cheia, submit() recusa o trabalho e o PDF é gerado quando for pedido.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+from pdf_cache import PDFCache
+
+RENDER_WORKERS = 2
+MAX_PENDING_RENDERS = 32
+
+
+class RenderQueue:
+    def __init__(self, pdf_cache: PDFCache, workers: int = RENDER_WORKERS, max_pending: int = MAX_PENDING_RENDERS):
+        self.pdf_cache = pdf_cache
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"pdf-render-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, contract_number: str) -> Optional[Future]:
+        """
+        Agenda a geração do PDF do contrato
+        Retorna o Future do trabalho, ou None se a fila estiver cheia
+        """
+        with self._lock:
+            if contract_number in self._jobs:
+                return self._jobs[contract_number]
+
+            future = Future()
+            try:
+                self._queue.put_nowait((contract_number, future))
+            except queue.Full:
+                return None
+            self._jobs[contract_number] = future
+            return future
+
+    def get_pdf(self, contract_number: str, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Espera pelo PDF do contrato (até timeout segundos)
+        Se não estiver na fila, lê do cache ou gera na hora
+        Levanta concurrent.futures.TimeoutError se o trabalho não terminar a tempo
+        """
+        with self._lock:
+            future = self._jobs.get(contract_number)
+        if future is not None:
+            return future.result(timeout)
+        return self.pdf_cache.get_contract_pdf(contract_number)
+
+    def close(self):
+        """Termina as threads depois de esvaziar a fila"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            contract_number, future = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self.pdf_cache.get_contract_pdf(contract_number))
+                except Exception as e:
+                    print(f"Erro ao gerar PDF em segundo plano ({contract_number}): {e}")
+                    future.set_exception(e)
+
+            # O PDF fica no cache; o trabalho já não precisa de ser acompanhado
+            with self._lock:
+                self._jobs.pop(contract_number, None)